@@ -1,11 +1,20 @@
-from fastapi import Depends, HTTPException, UploadFile
-from firebase_admin import auth, storage, credentials
-import uuid
+from fastapi import Depends, HTTPException, Query, UploadFile
+from firebase_admin import credentials
+from google.auth.transport.requests import Request as GoogleAuthRequest
+from google.oauth2 import id_token as google_id_token
+import hashlib
+import logging
+import re
+import threading
+import time
 import os
+from typing import Optional
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User
+from app.cache import TTLCache
+from app.images import image_uploader
 import firebase_admin
 
 # Initialize the Firebase Admin SDK with your service account credentials.
@@ -17,39 +26,142 @@ firebase_admin.initialize_app(cred, {
 })
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+logger = logging.getLogger(__name__)
+
+# Verified token claims, keyed by token hash and kept until the token's own `exp`
+token_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000")),
+    ttl=3600,  # Firebase ID tokens live for one hour
+)
+
+# Resolved users, kept briefly so repeat requests skip the users query
+user_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("AUTH_USER_CACHE_TTL", "30")),
+)
+
+# Firebase project whose ID tokens are accepted (the `aud` and issuer of every token)
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "campuseats-bf7cc")
+
+CERT_REFRESH_SECONDS = float(os.getenv("AUTH_CERT_REFRESH_SECONDS", "300"))
+_cert_refresher_started = threading.Event()
+
+# Public endpoint serving the keys that sign Firebase ID tokens
+ID_TOKEN_CERT_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+class CachedCertsRequest:
+    """
+    google-auth transport that keeps signing cert responses in memory for their Cache-Control max-age,
+    so token verification fetches certs only when none are cached. `refresh` (run by the background
+    thread) replaces the cached response before it goes stale.
+    """
+
+    def __init__(self, request=None):
+        self._request = request or GoogleAuthRequest()
+        self._responses = TTLCache(maxsize=8, ttl=86400)
+
+    def __call__(self, url, method="GET", **kwargs):
+        if method != "GET":
+            return self._request(url=url, method=method, **kwargs)
+        response = self._responses.get(url)
+        if response is None:
+            response = self.refresh(url)
+        return response
+
+    def refresh(self, url: str = ID_TOKEN_CERT_URL):
+        response = self._request(url=url, method="GET")
+        max_age = _MAX_AGE.search(response.headers.get("cache-control", "") or "")
+        if response.status == 200 and max_age:
+            self._responses.set(url, response, expires_at=time.time() + int(max_age.group(1)))
+        return response
+
+# Shared by every verification and the refresher, so refreshed certs are the ones verification uses
+signing_request = CachedCertsRequest()
+
+def _refresh_signing_certs():
+    """
+    Re-fetch the Firebase signing certs in the background so request threads find them cached;
+    failures are logged and retried, never fatal (verification then fetches inline).
+    """
+    while True:
+        try:
+            response = signing_request.refresh()
+            if response.status != 200:
+                logger.warning(f"Firebase signing cert fetch returned HTTP {response.status}")
+        except Exception as e:
+            logger.warning(f"Failed to refresh Firebase signing certs: {str(e)}")
+        time.sleep(CERT_REFRESH_SECONDS)
+
+def _start_cert_refresher():
+    if not _cert_refresher_started.is_set():
+        _cert_refresher_started.set()
+        threading.Thread(target=_refresh_signing_certs, name="firebase-cert-refresh", daemon=True).start()
+
+def verify_firebase_token(id_token: str) -> dict:
+    """Verify a Firebase ID token and return its decoded data (401 if invalid or expired)."""
+    _start_cert_refresher()
+
+    token_hash = hashlib.sha256(id_token.encode()).hexdigest()
+    decoded_token = token_cache.get(token_hash)
+    if decoded_token is not None:
+        return dict(decoded_token)
 
-def verify_token(token: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify Firebase token and return decoded token data."""
     try:
-        decoded_token = auth.verify_id_token(token.credentials)
-        return decoded_token
+        decoded_token = google_id_token.verify_firebase_token(id_token, signing_request, audience=FIREBASE_PROJECT_ID)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if not decoded_token.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    decoded_token["uid"] = decoded_token["sub"]  # As firebase_admin.auth.verify_id_token reports it
+
+    token_cache.set(token_hash, decoded_token, expires_at=decoded_token.get("exp"))
+    return dict(decoded_token)
+
+def verify_token(token: HTTPAuthorizationCredentials = Depends(security)):
+    """Verify Firebase token and return decoded token data."""
+    return verify_firebase_token(token.credentials)
+
+def verify_stream_token(
+    token: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+):
+    """
+    Like verify_token, for Server-Sent Events routes: browsers' EventSource cannot set headers, so the
+    ID token (valid for an hour) may be passed as the `token` query parameter instead.
+    """
+    id_token = credentials.credentials if credentials else token
+    if not id_token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return verify_firebase_token(id_token)
+
+def invalidate_cached_user(user_id: str):
+    """Drop a user from the auth cache after their row changes."""
+    user_cache.invalidate(user_id)
 
 def get_current_user(
     token_data: dict = Depends(verify_token), 
     db: Session = Depends(get_db)
 ) -> User:
     """Retrieve the current authenticated user from the database."""
+    cached_user = user_cache.get(token_data["uid"])
+    if cached_user is not None:
+        # Attach a copy to this request's session without re-querying
+        return db.merge(cached_user, load=False)
+
     user = db.query(User).filter(User.id == token_data["uid"]).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
-
-def upload_image_and_get_url(image: UploadFile) -> str:
 
-    print("Uploading image:", image.filename)
-    # Generate a unique file name
-    file_extension = image.filename.split(".")[-1]
-    filename = f"{uuid.uuid4()}.{file_extension}"
+    # Cache a detached copy so this request's commits can't expire it
+    db.expunge(user)
+    user_cache.set(user.id, user)
+    return db.merge(user, load=False)
 
-    # Upload to Firebase Storage
-    bucket = storage.bucket()
-    blob = bucket.blob(f"meals/{filename}")
-    blob.upload_from_file(image.file, content_type=image.content_type)
-
-    # Make the file publicly accessible
-    blob.make_public()
-
-    # Return the public URL
-    return blob.public_url
+def upload_image_and_get_url(image: UploadFile) -> str:
+    """Queue an image for background upload and return its public URL immediately."""
+    data = image.file.read()
+    return image_uploader.submit(data, image.filename or "", image.content_type)
@@ -0,0 +1,31 @@
+from sqlalchemy import inspect, text
+from app.database import SessionLocal, engine
+from app.models import Base, Meal
+from app.geo import grid_cell
+
+# Run from the backend directory: python -m app.backfill_geo_cells
+
+# Create database tables if they don't exist
+Base.metadata.create_all(bind=engine)
+
+# Existing databases predate the geo_cell column; add it and its index in place
+columns = [column["name"] for column in inspect(engine).get_columns("meals")]
+if "geo_cell" not in columns:
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE meals ADD COLUMN geo_cell INTEGER"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_meal_geo_cell ON meals (geo_cell, latitude, longitude)"))
+    print("Added meals.geo_cell column")
+
+session = SessionLocal()
+
+updated = 0
+for meal_id, latitude, longitude, current_cell in session.query(Meal.id, Meal.latitude, Meal.longitude, Meal.geo_cell):
+    cell = grid_cell(latitude, longitude)
+    if cell != current_cell:
+        session.query(Meal).filter(Meal.id == meal_id).update({Meal.geo_cell: cell}, synchronize_session=False)
+        updated += 1
+
+session.commit()
+session.close()
+
+print(f"Backfilled geo_cell for {updated} meals")
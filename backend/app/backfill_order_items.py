@@ -0,0 +1,50 @@
+from sqlalchemy import and_, exists, inspect, insert, select, text
+from app.database import SessionLocal, engine
+from app.models import Base, ChefOrder, order_meal_association
+
+# Run from the backend directory: python -m app.backfill_order_items
+#
+# Adds the quantity columns to order_meal_association and chef_orders on databases created before
+# they existed, creates the chef order index used by the live order feed, and fills the order line
+# items (left empty by older webhook versions) from the chef orders. Safe to re-run.
+
+
+def add_missing_columns():
+    """Existing databases predate the quantity columns; add them in place (existing rows get 1)."""
+    for table in ("order_meal_association", "chef_orders"):
+        columns = [column["name"] for column in inspect(engine).get_columns(table)]
+        if "quantity" not in columns:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1"))
+            print(f"Added {table}.quantity column")
+
+
+def add_missing_indexes():
+    """create_all skips indexes of tables that already exist; create the chef order ones missing."""
+    for index in ChefOrder.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+def backfill_order_items():
+    """Insert a line item for every chef order whose order has none for that meal; returns the row count."""
+    association = order_meal_association
+    missing = (
+        select(ChefOrder.order_id, ChefOrder.meal_id, ChefOrder.quantity)
+        .where(~exists().where(and_(association.c.order_id == ChefOrder.order_id, association.c.meal_id == ChefOrder.meal_id)))
+        .distinct()
+    )
+    session = SessionLocal()
+    try:
+        result = session.execute(insert(association).from_select(["order_id", "meal_id", "quantity"], missing))
+        session.commit()
+        return result.rowcount
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    add_missing_indexes()
+
+    print(f"Added {backfill_order_items()} order line items")
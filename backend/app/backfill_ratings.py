@@ -0,0 +1,69 @@
+from sqlalchemy import bindparam, func, inspect, text, update
+from app.database import SessionLocal, engine
+from app.models import Base, Meal, Review, User
+from app.crud import format_rating
+
+# Run from the backend directory: python -m app.backfill_ratings
+#
+# Recomputes the chef and meal rating aggregates (rating_sum / rating_count) from the reviews
+# table and repairs any rows that drifted. Safe to re-run.
+
+
+def add_missing_columns():
+    """Existing databases predate the aggregate columns; add them in place."""
+    for table in ("users", "meals"):
+        columns = [column["name"] for column in inspect(engine).get_columns(table)]
+        with engine.begin() as conn:
+            for column in ("rating_sum", "rating_count"):
+                if column not in columns:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+                    print(f"Added {table}.{column} column")
+
+
+def _repair(session, model, group_column, with_display=False):
+    totals = dict(
+        (key, (int(rating_sum), rating_count))
+        for key, rating_sum, rating_count in session.query(group_column, func.sum(Review.rating), func.count(Review.id)).group_by(group_column)
+    )
+
+    fixes = []
+    columns = [model.id, model.rating_sum, model.rating_count] + ([model.rating] if with_display else [])
+    for row in session.query(*columns).yield_per(10000):
+        rating_sum, rating_count = totals.get(row.id, (0, 0))
+        fix = {"row_id": row.id, "rating_sum": rating_sum, "rating_count": rating_count}
+        stale = (row.rating_sum, row.rating_count) != (rating_sum, rating_count)
+        if with_display:
+            # Users without reviews keep whatever display rating they had
+            fix["rating"] = format_rating(rating_sum, rating_count) if rating_count else row.rating
+            stale = stale or fix["rating"] != row.rating
+        if stale:
+            fixes.append(fix)
+
+    if fixes:
+        values = {"rating_sum": bindparam("rating_sum"), "rating_count": bindparam("rating_count")}
+        if with_display:
+            values["rating"] = bindparam("rating")
+        statement = update(model.__table__).where(model.__table__.c.id == bindparam("row_id")).values(**values)
+        session.connection().execute(statement, fixes)
+    return len(fixes)
+
+
+def recompute_rating_aggregates():
+    """Recompute every chef and meal aggregate from reviews; returns (chefs fixed, meals fixed)."""
+    session = SessionLocal()
+    try:
+        chefs = _repair(session, User, Review.chef_id, with_display=True)
+        meals = _repair(session, Meal, Review.meal_id)
+        session.commit()
+        return chefs, meals
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    # Create database tables if they don't exist
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+
+    chefs, meals = recompute_rating_aggregates()
+    print(f"Repaired rating aggregates for {chefs} chefs and {meals} meals")
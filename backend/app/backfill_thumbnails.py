@@ -0,0 +1,33 @@
+from sqlalchemy import inspect, text
+from app.database import SessionLocal, engine
+from app.images import image_uploader, upload_path_for, variant_path
+from app.models import Base, Meal
+
+# Run from the backend directory: python -m app.backfill_thumbnails
+
+# Create database tables if they don't exist
+Base.metadata.create_all(bind=engine)
+
+# Existing databases predate the thumbnail_url column; add it in place
+columns = [column["name"] for column in inspect(engine).get_columns("meals")]
+if "thumbnail_url" not in columns:
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE meals ADD COLUMN thumbnail_url VARCHAR"))
+    print("Added meals.thumbnail_url column")
+
+session = SessionLocal()
+backend = image_uploader.backend
+
+# Only images stored by the upload pipeline have thumbnails, and only if rendering them succeeded
+updated = 0
+for meal_id, image_url in session.query(Meal.id, Meal.image_url).filter(Meal.thumbnail_url.is_(None)):
+    path = upload_path_for(image_url)
+    if path and backend.exists(variant_path(path, "thumb")):
+        thumbnail_url = backend.public_url(variant_path(path, "thumb"))
+        session.query(Meal).filter(Meal.id == meal_id).update({Meal.thumbnail_url: thumbnail_url}, synchronize_session=False)
+        updated += 1
+
+session.commit()
+session.close()
+
+print(f"Backfilled thumbnail_url for {updated} meals")
@@ -0,0 +1,43 @@
+from sqlalchemy import delete, insert
+from app.database import SessionLocal, engine
+from app.models import Base, Meal, MealTimeslot
+from app.timeslots import slot_ranges
+
+# Run from the backend directory: python -m app.backfill_timeslots
+#
+# Rebuilds the meal_timeslots availability index from Meal.timeslots. Needed once for databases
+# created before the table existed and after bulk loads that bypass the ORM. Safe to re-run.
+
+BATCH_SIZE = 10000
+
+
+def rebuild_timeslot_index():
+    """Replace every meal_timeslots row with ranges derived from meals.timeslots; returns the row count."""
+    session = SessionLocal()
+    try:
+        connection = session.connection()
+        connection.execute(delete(MealTimeslot.__table__))
+
+        rows, total = [], 0
+        for meal_id, timeslots in session.query(Meal.id, Meal.timeslots).yield_per(BATCH_SIZE):
+            rows.extend({"meal_id": meal_id, "start_minute": start, "end_minute": end} for start, end in slot_ranges(timeslots))
+            if len(rows) >= BATCH_SIZE:
+                connection.execute(insert(MealTimeslot.__table__), rows)
+                total += len(rows)
+                rows = []
+        if rows:
+            connection.execute(insert(MealTimeslot.__table__), rows)
+            total += len(rows)
+
+        session.commit()
+        return total
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    # Create database tables if they don't exist
+    Base.metadata.create_all(bind=engine)
+
+    slots = rebuild_timeslot_index()
+    print(f"Indexed {slots} meal timeslots")
@@ -0,0 +1,36 @@
+from sqlalchemy import update
+from app.database import SessionLocal, engine
+from app.models import Base, Meal
+
+# Run from the backend directory: python -m app.backfill_unlimited_meals
+#
+# Older versions stored meals created without a stock count as quantity 99999999 instead of marking
+# them unlimited, so checkout holds decremented them. Marks those rows unlimited with no quantity,
+# and clears the leftover quantity of meals already marked unlimited. Safe to re-run.
+
+SENTINEL_QUANTITY = 99999999
+
+
+def backfill_unlimited_meals():
+    """Convert sentinel-quantity meals to unlimited ones; returns the row count."""
+    session = SessionLocal()
+    try:
+        # Holds taken against a sentinel row may have decremented it a little below the sentinel
+        sentinel = Meal.quantity >= SENTINEL_QUANTITY - 1000000
+        result = session.execute(
+            update(Meal)
+            .where(sentinel | (Meal.unlimited.is_(True) & Meal.quantity.is_not(None)))
+            .values(unlimited=True, quantity=None)
+        )
+        session.commit()
+        return result.rowcount
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    # Create database tables if they don't exist
+    Base.metadata.create_all(bind=engine)
+
+    updated = backfill_unlimited_meals()
+    print(f"Marked {updated} meals unlimited")
@@ -0,0 +1,68 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Conditional GET for rarely-changing resources: routes derive validators from a cheap version
+# lookup (timestamps and counts, see the *_version functions in crud.py) and answer a matching
+# If-None-Match / If-Modified-Since with 304 Not Modified before loading or serialising anything.
+
+# Cache-Control policies. Meals and menus show live stock, so clients always revalidate (cheap with
+# a 304); older review pages (requested with a cursor) only change when reviews are deleted
+MEAL_CACHE_CONTROL = "public, no-cache"
+MENU_CACHE_CONTROL = "public, no-cache"
+REVIEWS_CACHE_CONTROL = "public, no-cache"
+OLDER_REVIEWS_CACHE_CONTROL = "public, max-age=300"
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag from a resource's version parts (the representation is only semantically stable)."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Naive timestamps in this schema are UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2): opaque tags compared without their W/ prefix
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+
+
+def conditional_response(request: Request, response: Response, etag: str, cache_control: str,
+                         last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """
+    Set ETag, Cache-Control (and Last-Modified, when given) on the route's `response`.
+    Returns a 304 response to send instead of the body when the client's copy is current, else None.
+    If-Modified-Since is only consulted without If-None-Match, as RFC 9110 requires.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        current = _etag_matches(if_none_match, etag)
+    else:
+        current = last_modified is not None and if_modified_since is not None and _not_modified_since(if_modified_since, last_modified)
+
+    if current:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
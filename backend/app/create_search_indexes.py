@@ -0,0 +1,26 @@
+from sqlalchemy import text
+from app.database import engine
+from app.models import Base
+
+# Run from the backend directory: python -m app.create_search_indexes
+#
+# Adds the pg_trgm extension and trigram indexes used by /meals/search to an existing Postgres
+# database (create_all only builds indexes for new tables). Indexes are built CONCURRENTLY so
+# meals stay writable. Other databases use the in-process search index and need nothing.
+
+SEARCH_COLUMNS = ("name", "description", "ingredients")
+
+if engine.dialect.name != "postgresql":
+    print(f"Nothing to do for {engine.dialect.name}; search uses the in-process index")
+else:
+    # Create database tables if they don't exist
+    Base.metadata.create_all(bind=engine)
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for column in SEARCH_COLUMNS:
+            conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_meal_{column}_trgm ON meals USING gin ({column} gin_trgm_ops)"
+            ))
+            print(f"Trigram index on meals.{column} is in place")
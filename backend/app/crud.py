@@ -1,31 +1,25 @@
 import json
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.models import Meal, Cart, User, ChefOrder, Order, Review
-from app.schemas import MealCreate, MealUpdate, MealResponse, ChefOrderCreate, ChefOrderResponse, ReviewCreate
+from sqlalchemy.orm import Session, joinedload, load_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, or_, and_, select, update, exists, literal
+from app.models import Meal, MealTimeslot, Cart, User, ChefOrder, Order, Review
+from app.schemas import MealCreate, MealUpdate, MealResponse, MealSummary, TimeSlot, ChefOrderCreate, ChefOrderResponse, ReviewCreate
+from app.geo import EARTH_RADIUS_M, bounding_box, candidate_cells, cursor_distance
+from app.geo_cache import nearby_meals_cache
+from app.database import SessionLocal, engine
+from app.images import UploadResult
+from app.search import SEARCH_FIELD_WEIGHTS, MAX_CANDIDATES, meal_search_index
 from math import radians, cos, sin, sqrt, atan2, dist
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
 from firebase_admin import auth
 
 
-# Create a new meal
-def create_meal(db: Session, meal: MealCreate, seller_id: str) -> Meal:
-
-    if isinstance(meal.quantity, str):
-        try:
-            # If the quantity is a string, convert it to an integer (if possible)
-            meal.quantity = int(meal.quantity)
-        except ValueError:
-            # If the string can't be converted to an integer, set to a default value (99999999)
-            meal.quantity = 99999999
-    elif meal.quantity is None:
-        # If quantity is None, set to a default value (99999999)
-        meal.quantity = 99999999
-
-
-    for slot in meal.timeslots:
+# Reject malformed or empty timeslots (422)
+def _validate_timeslots(timeslots: List[TimeSlot]):
+    for slot in timeslots:
         try:
             start_time = datetime.strptime(slot.start, "%H:%M").time()
             end_time = datetime.strptime(slot.end, "%H:%M").time()
@@ -35,19 +29,41 @@ def create_meal(db: Session, meal: MealCreate, seller_id: str) -> Meal:
         if start_time >= end_time:
             raise HTTPException(status_code=422, detail=f"Start time must be before end time in timeslot: {slot.start}, {slot.end}")
 
+# A meal without a usable stock count (missing, or a string like "Unlimited") is unlimited, with no quantity
+def _stock(quantity, unlimited):
+    if isinstance(quantity, str):
+        try:
+            quantity = int(quantity)
+        except ValueError:
+            quantity = None
+    if unlimited or quantity is None:
+        return None, True
+    return quantity, False
+
+# Validate a new meal and build its (unsaved) row
+def _build_meal(meal: MealCreate, seller_id: str) -> Meal:
+
+    quantity, unlimited = _stock(meal.quantity, meal.unlimited)
+    _validate_timeslots(meal.timeslots)
+
     db_meal = Meal(
         name=meal.name,
         description=meal.description,
         ingredients=meal.ingredients,
         price=meal.price,
-        quantity=meal.quantity,
+        quantity=quantity,
         image_url=meal.image_url,
         seller_id=seller_id,
         latitude=meal.latitude,
         longitude=meal.longitude,
-        unlimited=meal.unlimited,
+        unlimited=unlimited,
         timeslots=[slot.dict() for slot in meal.timeslots],  # Convert Pydantic model to dict
     )
+    return db_meal
+
+# Create a new meal
+def create_meal(db: Session, meal: MealCreate, seller_id: str) -> Meal:
+    db_meal = _build_meal(meal, seller_id)
     try:
         db.add(db_meal)
         db.commit()
@@ -57,6 +73,18 @@ def create_meal(db: Session, meal: MealCreate, seller_id: str) -> Meal:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+# Create a new meal from an async route
+async def create_meal_async(db: AsyncSession, meal: MealCreate, seller_id: str) -> Meal:
+    db_meal = _build_meal(meal, seller_id)
+    try:
+        db.add(db_meal)
+        await db.commit()
+        await db.refresh(db_meal, attribute_names=["seller"])  # MealResponse nests the seller
+        return db_meal
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
 # Calculate distance between two locations (returns kilometers)
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Returns distance in kilometers between two latitude/longitude points using Haversine formula."""
@@ -65,29 +93,61 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
     return 2 * R * atan2(sqrt(a), sqrt(1 - a))
 
+# Columns needed to render a MealSummary, with its seller fetched in the same query
+def meal_summary_options():
+    return (
+        load_only(
+            Meal.id, Meal.name, Meal.description, Meal.ingredients, Meal.price, Meal.image_url, Meal.thumbnail_url,
+            Meal.quantity, Meal.seller_id, Meal.latitude, Meal.longitude, Meal.timeslots, Meal.unlimited,
+            Meal.rating_sum, Meal.rating_count,
+        ),
+        joinedload(Meal.seller).load_only(
+            User.id, User.username, User.profile_picture, User.rating, User.rating_sum, User.rating_count,
+        ),
+    )
+
 # Get a meal by ID (raises 404 if not found)
 def get_meal(db: Session, meal_id: int) -> Optional[Meal]:
-    meal = db.get(Meal, meal_id)
+    meal = db.get(Meal, meal_id, options=[joinedload(Meal.seller)])
     if meal is None:
         raise HTTPException(status_code=404, detail="Meal not found")
     return meal
 
-def get_menu(db: Session, seller_id: str,):
-    meals = db.query(Meal).filter(Meal.seller_id == seller_id).all()
-    return meals if meals else []
+# Validators for conditional GETs (see app.conditional), from indexed columns only
 
-# Fetch nearby meals with distance calculation
-def get_meals(db: Session, user_lat: float, user_lon: float, radius: float = 10, skip: int = 0, limit: int = 10) -> List[MealResponse]:
-    """
-    Retrieve meals within a given radius (km) from the user's location, sorted by distance.
-    Supports pagination with `skip` and `limit`.
-    Each returned Meal object has an extra attribute 'distance'.
-    """
-    earth_radius_m = 6371000  # Earth's radius in km
+def get_meal_version(db: Session, meal_id: int) -> Optional[tuple]:
+    """(meal updated_at, meal rating_count, seller updated_at, seller rating_count), or None if the meal does not exist."""
+    return (
+        db.query(Meal.updated_at, Meal.rating_count, User.updated_at, User.rating_count)
+        .join(User, Meal.seller_id == User.id)
+        .filter(Meal.id == meal_id)
+        .first()
+    )
+
+def get_menu_version(db: Session, seller_id: str) -> Optional[tuple]:
+    """(meal count, newest meal ID, latest meal update, seller updated_at, seller rating_count), or None without meals."""
+    version = (
+        db.query(func.count(Meal.id), func.max(Meal.id), func.max(Meal.updated_at), func.max(User.updated_at), func.max(User.rating_count))
+        .join(User, Meal.seller_id == User.id)
+        .filter(Meal.seller_id == seller_id)
+        .one()
+    )
+    return tuple(version) if version[0] else None
+
+def get_reviews_version(db: Session, meal_id: Optional[str] = None, chef_id: Optional[str] = None) -> tuple:
+    """(review count, newest review ID) for a meal's or chef's reviews; reviews are never edited."""
+    query = db.query(func.count(Review.id), func.max(Review.id))
+    query = query.filter(Review.meal_id == meal_id) if meal_id is not None else query.filter(Review.chef_id == chef_id)
+    return tuple(query.one())
+
+def get_menu(db: Session, seller_id: str,) -> List[MealSummary]:
+    meals = db.query(Meal).options(*meal_summary_options()).filter(Meal.seller_id == seller_id).all()
+    return meals if meals else []
 
-    # Haversine formula for calculating distance in SQLAlchemy
-    distance_formula = (
-        earth_radius_m
+def distance_expression(user_lat: float, user_lon: float):
+    # Haversine formula for calculating distance in SQLAlchemy (meters)
+    return (
+        EARTH_RADIUS_M
         * func.acos(
             func.cos(func.radians(user_lat))
             * func.cos(func.radians(Meal.latitude))
@@ -97,24 +157,171 @@ def get_meals(db: Session, user_lat: float, user_lon: float, radius: float = 10,
         )
     ).label("distance")
 
+def filter_within_radius(query, user_lat: float, user_lon: float, radius: float, distance_formula):
+    """Restrict a meals query to `radius` meters, prefiltering on the bounding box and grid cells."""
+    query = query.filter(Meal.latitude.isnot(None), Meal.longitude.isnot(None))
+
+    # Cheap index-backed prefilter so the exact distance is only computed for nearby candidates
+    box = bounding_box(user_lat, user_lon, radius)
+    if box:
+        min_lat, max_lat, min_lon, max_lon = box
+        query = query.filter(
+            Meal.latitude.between(min_lat, max_lat),
+            Meal.longitude.between(min_lon, max_lon),
+        )
+        cells = candidate_cells(box)
+        if cells:
+            query = query.filter(Meal.geo_cell.in_(cells))
+
+    return query.filter(distance_formula < radius)  # Only meals within the radius
+
+def filter_available(query, windows: List[Tuple[int, int]], dialect: str):
+    """Restrict a meals query to meals with a timeslot overlapping any of the minute-of-day `windows`."""
+    if dialect == "postgresql":
+        # Same expression as idx_meal_timeslot_range so the GiST index is usable
+        slot_range = func.int4range(MealTimeslot.start_minute, MealTimeslot.end_minute)
+        overlaps = or_(*(slot_range.op("&&")(func.int4range(start, end)) for start, end in windows))
+    else:
+        overlaps = or_(*(and_(MealTimeslot.start_minute < end, MealTimeslot.end_minute > start) for start, end in windows))
+    return query.filter(exists().where(MealTimeslot.meal_id == Meal.id, overlaps))
+
+def _meal_positions_loader(db: Session, available: Optional[List[Tuple[int, int]]]):
+    # Fills nearby_meals_cache: the meals within `cover_m` of a tile center, nearest first.
+    # Always read from the primary: tiles are invalidated when writes commit there, so a lagging
+    # replica could store candidates from before a write that has already dropped its tiles
+    def query_positions(session: Session, center_lat: float, center_lon: float, cover_m: float, limit: int):
+        distance_formula = distance_expression(center_lat, center_lon)
+        query = filter_within_radius(
+            session.query(Meal.id, Meal.latitude, Meal.longitude, distance_formula),
+            center_lat, center_lon, cover_m, distance_formula,
+        )
+        if available:
+            query = filter_available(query, available, session.get_bind().dialect.name)
+        return query.order_by(distance_formula, Meal.id).limit(limit).all()
+
+    def load(center_lat: float, center_lon: float, cover_m: float, limit: int):
+        if db.get_bind() is engine:
+            return query_positions(db, center_lat, center_lon, cover_m, limit)
+        with SessionLocal() as primary:
+            return query_positions(primary, center_lat, center_lon, cover_m, limit)
+    return load
+
+# Fetch nearby meals with distance calculation
+def get_meals(db: Session, user_lat: float, user_lon: float, radius: float = 10, skip: int = 0, limit: int = 10, after: Optional[Tuple[float, int]] = None, available: Optional[List[Tuple[int, int]]] = None) -> List[MealSummary]:
+    """
+    Retrieve meals within a given radius (meters) from the user's location, sorted by distance.
+    Candidates are narrowed with a bounding box and grid cells before exact distance ranking.
+    Supports keyset pagination with `after` = (distance, meal id) of the previous page's last meal,
+    or offset pagination with `skip` and `limit`.
+    With `available` (minute-of-day windows, see app.timeslots.query_windows) only meals with a
+    pickup slot overlapping one of the windows are returned.
+    Each returned Meal object has extra attributes 'distance' (rounded) and 'sort_distance' (exact).
+    Pages are ranked from the location-tile cache when it can answer (see app.geo_cache).
+    """
+    page = nearby_meals_cache.nearest(
+        user_lat, user_lon, radius, available, _meal_positions_loader(db, available), skip=skip, limit=limit, after=after,
+    )
+    if page is not None:
+        loaded = get_meals_by_ids(db, [meal_id for _, meal_id in page])
+        meals_with_distance = []
+        for distance, meal_id in page:
+            meal = loaded.get(meal_id)
+            if meal is not None:  # Deleted by another worker since the tile was cached
+                meal.distance = round(distance)
+                meal.sort_distance = distance
+                meals_with_distance.append(meal)
+        return meals_with_distance
+
+    distance_formula = distance_expression(user_lat, user_lon)
     query = (
         db.query(Meal, distance_formula)
-        .filter(Meal.latitude.isnot(None), Meal.longitude.isnot(None))
-        .filter(distance_formula < radius)  # Only meals within the radius
-        .order_by(distance_formula)
-        .offset(skip)
-        .limit(limit)
+        .options(*meal_summary_options())
     )
+    query = filter_within_radius(query, user_lat, user_lon, radius, distance_formula)
+    if available:
+        query = filter_available(query, available, db.get_bind().dialect.name)
+
+    if after:
+        # The cursor may have been built by the tile cache; rank from the cursor meal's distance as SQL computes it
+        last_distance, last_id = after
+        last_distance = cursor_distance(last_distance, db.scalar(select(distance_formula).where(Meal.id == last_id)))
+        query = query.filter(or_(
+            distance_formula > last_distance,
+            and_(distance_formula == last_distance, Meal.id > last_id),
+        ))
+
+    query = query.order_by(distance_formula, Meal.id)
+    if not after:
+        query = query.offset(skip)
+    query = query.limit(limit)
 
     results = query.all()  # results is a list of tuples: (Meal, distance)
     meals_with_distance = []
     for meal, distance in results:
         meal.distance = round(distance)  # Attach the extra field
+        meal.sort_distance = distance  # Exact sort key, used to build the next-page cursor
         meals_with_distance.append(meal)
         
     return meals_with_distance
 
 
+
+def search_meals(db: Session, q: str, user_lat: Optional[float] = None, user_lon: Optional[float] = None, radius: float = 250000.0, skip: int = 0, limit: int = 20) -> List[Meal]:
+    """
+    Ranked fuzzy search over meal name, ingredients and description, optionally limited to
+    `radius` meters around (user_lat, user_lon). Ties are broken by distance when a location is given.
+    Uses pg_trgm (trigram GIN indexes) on Postgres and the in-process index elsewhere.
+    """
+    located = user_lat is not None and user_lon is not None
+    distance_formula = distance_expression(user_lat, user_lon) if located else None
+
+    if db.get_bind().dialect.name == "postgresql":
+        # word_similarity(q, column) scores the best-matching extent of the column; the `%>`
+        # operator (same measure against pg_trgm.word_similarity_threshold) can use the GIN indexes
+        score = sum(
+            weight * func.word_similarity(q, func.coalesce(getattr(Meal, field), ""))
+            for field, weight in SEARCH_FIELD_WEIGHTS.items()
+        ).label("score")
+        columns = [Meal, score] + ([distance_formula] if located else [])
+        query = db.query(*columns).options(*meal_summary_options()).filter(
+            or_(*(getattr(Meal, field).op("%>")(q) for field in SEARCH_FIELD_WEIGHTS))
+        )
+        if located:
+            query = filter_within_radius(query, user_lat, user_lon, radius, distance_formula)
+        order = [score.desc()] + ([distance_formula] if located else []) + [Meal.id]
+        rows = query.order_by(*order).offset(skip).limit(limit).all()
+    else:
+        meal_search_index.ensure_fresh(db)
+        scores = meal_search_index.search(q, MAX_CANDIDATES)  # best first, ties by meal ID
+        ranked = list(scores.items())
+        if located:
+            # Apply the radius and distance tie-break on plain columns, then load only the page
+            candidates = filter_within_radius(
+                db.query(Meal.id, distance_formula).filter(Meal.id.in_(scores)),
+                user_lat, user_lon, radius, distance_formula,
+            ).all()
+            distances = dict(candidates)
+            ranked = sorted(
+                ((meal_id, score) for meal_id, score in ranked if meal_id in distances),
+                key=lambda item: (-item[1], distances[item[0]], item[0]),
+            )
+        page = ranked[skip:skip + limit]
+        if not page:
+            return []
+        page_ids = [meal_id for meal_id, _ in page]
+        loaded = {meal.id: meal for meal in db.query(Meal).options(*meal_summary_options()).filter(Meal.id.in_(page_ids))}
+        rows = [
+            (loaded[meal_id], score) + ((distances[meal_id],) if located else ())
+            for meal_id, score in page if meal_id in loaded
+        ]
+
+    meals = []
+    for meal, _, *distance in rows:
+        if located:
+            meal.distance = round(distance[0])
+        meals.append(meal)
+    return meals
+
 # Update a meal (raises 404 if not found)
 def update_meal(db: Session, meal_id: int, meal_update: MealUpdate, seller_id: str) -> Meal:
     db_meal = db.query(Meal).filter(Meal.id == meal_id, Meal.seller_id == seller_id).first()
@@ -124,9 +331,16 @@ def update_meal(db: Session, meal_id: int, meal_update: MealUpdate, seller_id: s
 
     update_data = meal_update.dict(exclude_unset=True)
     update_data = {k: v for k, v in update_data.items() if v is not None}  # ✅ Skip overwriting with None
+    if meal_update.timeslots is not None:
+        _validate_timeslots(meal_update.timeslots)
+    if "quantity" in update_data or "unlimited" in update_data:
+        update_data["quantity"], update_data["unlimited"] = _stock(
+            update_data.get("quantity", db_meal.quantity), update_data.get("unlimited", False))
 
     for key, value in update_data.items():
         setattr(db_meal, key, value)
+    if "image_url" in update_data:
+        db_meal.thumbnail_url = None  # Filled in by apply_image_upload once the new image is processed
 
     try:
         db.commit()
@@ -138,6 +352,21 @@ def update_meal(db: Session, meal_id: int, meal_update: MealUpdate, seller_id: s
 
 
 
+def apply_image_upload(db: Session, result: UploadResult):
+    """
+    Record a finished background upload on the meals showing it: the thumbnail once it is stored,
+    or no image at all when the original could not be stored.
+    """
+    values = {"thumbnail_url": result.thumbnail_url} if result.saved else {"image_url": None, "thumbnail_url": None}
+    db.execute(update(Meal).where(Meal.image_url == result.image_url).values(**values))
+    db.commit()
+
+def record_image_upload(result: UploadResult):
+    """ImageUploader.on_finished callback (runs on an upload thread)."""
+    with SessionLocal() as db:
+        apply_image_upload(db, result)
+
+
 # Delete a meal (raises 404 if not found)
 def delete_meal(db: Session, meal_id: int) -> dict:
     db_meal = get_meal(db, meal_id)  # Reuses `get_meal()` to check existence
@@ -152,20 +381,35 @@ def delete_meal(db: Session, meal_id: int) -> dict:
     
 
 
-def get_cart_with_meals(db: Session, user_id: str):
-    cart = db.query(Cart).filter(Cart.user_id == user_id).first()
-    if not cart:
-        return {"user_id": user_id, "cart_items": []}
+def _as_meal_id(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_meals_by_ids(db: Session, meal_ids: list) -> dict:
+    """Fetch meals (with their sellers) in one query, keyed by meal ID."""
+    ids = {meal_id for meal_id in map(_as_meal_id, meal_ids) if meal_id is not None}
+    if not ids:
+        return {}
+    meals = db.query(Meal).options(*meal_summary_options()).filter(Meal.id.in_(ids)).all()
+    return {meal.id: meal for meal in meals}
+
 
+def _load_cart_items(cart: Cart) -> list:
     try:
-        items = json.loads(cart.cart_items) if isinstance(cart.cart_items, str) else cart.cart_items
+        return json.loads(cart.cart_items) if isinstance(cart.cart_items, str) else cart.cart_items
     except Exception:
-        items = []
+        return []
 
-    enriched_items = []
 
+def _enrich_cart(db: Session, user_id: str, items: list):
+    meals = get_meals_by_ids(db, [item.get("meal_id") for item in items])
+
+    enriched_items = []
     for item in items:
-        meal = db.query(Meal).filter(Meal.id == item.get("meal_id")).first()
+        meal = meals.get(_as_meal_id(item.get("meal_id")))
         if meal:
             enriched_items.append({
                 "meal_id": item.get("meal_id"),
@@ -179,10 +423,36 @@ def get_cart_with_meals(db: Session, user_id: str):
     }
 
 
+def get_cart_with_meals(db: Session, user_id: str):
+    cart = db.query(Cart).filter(Cart.user_id == user_id).first()
+    if not cart:
+        return {"user_id": user_id, "cart_items": []}
+
+    return _enrich_cart(db, user_id, _load_cart_items(cart))
+
+
+def remove_cart_item(db: Session, user_id: str, meal_id: int):
+    cart = db.query(Cart).filter(Cart.user_id == user_id).first()
+    if not cart:
+        raise HTTPException(status_code=404, detail="Cart not found")
+
+    # Filter out the meal to remove
+    items = [item for item in _load_cart_items(cart) if item.get("meal_id") != meal_id]
+
+    # Update the cart_items JSON field
+    cart.cart_items = items
+    db.commit()
+
+    # Return enriched cart data (dict with meal details)
+    return _enrich_cart(db, user_id, items)
+
+
 def create_or_update_cart(db: Session, user_id: str, items: list):
+    meals = get_meals_by_ids(db, [item.get("meal_id") for item in items])
+
     updated_items = []
     for item in items:
-        meal = db.query(Meal).filter(Meal.id == item["meal_id"]).first()
+        meal = meals.get(_as_meal_id(item.get("meal_id")))
         if not meal:
             continue  # Skip invalid items
         
@@ -217,24 +487,24 @@ def cleanup_old_carts(db: Session, days_old: int = 30):
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def create_user(db: Session, email: str):
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+def _get_or_create_firebase_user(email: str):
     try:
         # Try to get the user from Firebase
-        firebase_user = auth.get_user_by_email(email)
+        return auth.get_user_by_email(email)
     except auth.UserNotFoundError:
         # If not found, create in Firebase
-        firebase_user = auth.create_user(email=email)
-
-    # Now check if the user exists in your PostgreSQL DB
-    user = db.query(User).filter(User.id == firebase_user.uid).first()
-    if user:
-        return user
+        return auth.create_user(email=email)
 
+def _new_user_row(firebase_user, email: str) -> User:
     # If the Firebase user exists but not in DB, create a new DB record
     username = email.split('@')[0]
 
     # Fill all NOT NULL fields (avoid IntegrityError)
-    new_user = User(
+    return User(
         id=firebase_user.uid,
         email=email,
         username=username,
@@ -247,11 +517,33 @@ def create_user(db: Session, email: str):
         rating=0
     )
 
+def create_user(db: Session, email: str):
+    firebase_user = _get_or_create_firebase_user(email)
+
+    # Now check if the user exists in your PostgreSQL DB
+    user = db.query(User).filter(User.id == firebase_user.uid).first()
+    if user:
+        return user
+
+    new_user = _new_user_row(firebase_user, email)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
     return new_user
 
+async def create_user_async(db: AsyncSession, email: str):
+    # The Firebase Admin SDK is blocking, keep it off the event loop
+    firebase_user = await run_in_threadpool(_get_or_create_firebase_user, email)
+
+    user = await db.get(User, firebase_user.uid)
+    if user:
+        return user
+
+    new_user = _new_user_row(firebase_user, email)
+    db.add(new_user)
+    await db.commit()
+    return new_user
+
 
 
 
@@ -347,9 +639,24 @@ def clear_user_cart(db: Session, user_id: int):
         db.commit()
 
 
+def format_rating(rating_sum: int, rating_count: int) -> Optional[str]:
+    """Display form of a rating aggregate, e.g. "4.3 (387)"."""
+    if not rating_count:
+        return None
+    return f"{rating_sum / rating_count:.1f} ({rating_count})"
+
+def _add_rating(db: Session, model, row_id, rating: int):
+    # Increment in SQL so concurrent reviews cannot lose updates
+    return db.execute(
+        update(model)
+        .where(model.id == row_id)
+        .values(rating_sum=model.rating_sum + rating, rating_count=model.rating_count + 1)
+        .returning(model.rating_sum, model.rating_count)
+    ).first()
+
 def create_review(db: Session, review_data: ReviewCreate, user_id: str):
     # Ensure order is completed and belongs to this user
-    order = db.query(Order).filter_by(id=review_data.order_id, user_id=user_id, status="completed").first()
+    order = db.query(Order).filter_by(id=review_data.order_id, buyer_id=user_id, status="completed").first()
     if not order:
         raise HTTPException(status_code=403, detail="You can only review completed orders.")
 
@@ -360,20 +667,78 @@ def create_review(db: Session, review_data: ReviewCreate, user_id: str):
 
     review = Review(**review_data.dict(), reviewer_id=user_id)
     db.add(review)
+
+    # Update the meal and chef aggregates in the same transaction as the review
+    if not _add_rating(db, Meal, _as_meal_id(review_data.meal_id), review.rating):
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Meal not found")
+    chef_totals = _add_rating(db, User, review_data.chef_id, review.rating)
+    if not chef_totals:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Chef not found")
+    db.execute(update(User).where(User.id == review_data.chef_id).values(rating=format_rating(*chef_totals)))
+
     db.commit()
     db.refresh(review)
     return review
 
-def get_reviews_for_meal(db: Session, meal_id: str):
-    return db.query(Review).filter_by(meal_id=meal_id).order_by(Review.created_at.desc()).all()
-
-def get_reviews_for_chef(db: Session, chef_id: str):
-    return db.query(Review).filter_by(chef_id=chef_id).order_by(Review.created_at.desc()).all()
-
-def get_average_rating_for_chef(db: Session, chefId: str):
-    result = db.query(func.avg(Review.rating), func.count(Review.id)).filter_by(chef_id=chefId).first()
+def _review_created_at(query):
+    """
+    Review.created_at as compared by keyset pagination. SQLite keeps server-default timestamps as
+    second-resolution text while cursor values bind with microseconds, so text comparison never
+    moves past a page boundary there; compare Julian day numbers instead.
+    """
+    if query.session.get_bind().dialect.name == "sqlite":
+        return func.julianday(Review.created_at), func.julianday
+    return Review.created_at, lambda value: value
+
+def _paginate_reviews(query, limit: Optional[int], after: Optional[Tuple[datetime, int]]):
+    """Newest-first keyset pagination on (created_at, id)."""
+    created_at, bind = _review_created_at(query)
+    if after:
+        last_created_at, last_id = after
+        last_created_at = bind(literal(last_created_at, Review.created_at.type))
+        query = query.filter(or_(
+            created_at < last_created_at,
+            and_(created_at == last_created_at, Review.id < last_id),
+        ))
+    query = query.order_by(created_at.desc(), Review.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_reviews_for_meal(db: Session, meal_id: str, limit: Optional[int] = None, after: Optional[Tuple[datetime, int]] = None):
+    return _paginate_reviews(db.query(Review).filter_by(meal_id=meal_id), limit, after)
+
+def get_reviews_for_chef(db: Session, chef_id: str, limit: Optional[int] = None, after: Optional[Tuple[datetime, int]] = None):
+    return _paginate_reviews(db.query(Review).filter_by(chef_id=chef_id), limit, after)
+
+def rating_summary(rating_sum: int, rating_count: int) -> dict:
     return {
-        "average_rating": round(float(result[0]), 1) if result[0] else 0.0,
-        "review_count": result[1]
+        "average_rating": round(rating_sum / rating_count, 1) if rating_count else 0.0,
+        "review_count": rating_count
     }
 
+def get_average_rating_for_chef(db: Session, chefId: str):
+    # Read the aggregate maintained by create_review instead of scanning reviews
+    result = db.query(User.rating_sum, User.rating_count).filter(User.id == chefId).first()
+    return rating_summary(*result) if result else rating_summary(0, 0)
+
+def get_rating_summaries(db: Session, chef_ids: List[str], meal_ids: List[int]) -> dict:
+    """Rating summaries for many chefs and meals, one IN query per kind."""
+    chefs, meals = {}, {}
+    if chef_ids:
+        rows = db.query(User.id, User.rating_sum, User.rating_count).filter(User.id.in_(set(chef_ids)))
+        chefs = {chef_id: rating_summary(total, count) for chef_id, total, count in rows}
+    if meal_ids:
+        rows = db.query(Meal.id, Meal.rating_sum, Meal.rating_count).filter(Meal.id.in_(set(meal_ids)))
+        meals = {meal_id: rating_summary(total, count) for meal_id, total, count in rows}
+    return {"chefs": chefs, "meals": meals}
+
+def attach_rating_summaries(meals: List[Meal]) -> List[Meal]:
+    """Fill `rating_summary` on meals and their sellers from the columns already loaded."""
+    for meal in meals:
+        meal.rating_summary = rating_summary(meal.rating_sum, meal.rating_count)
+        meal.seller.rating_summary = rating_summary(meal.seller.rating_sum, meal.seller.rating_count)
+    return meals
+
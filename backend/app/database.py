@@ -1,7 +1,16 @@
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, MetaData, exc
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from fastapi import Request
+from app.cache import TTLCache
+from app.metrics import Counter, Gauge, Histogram
+from app.middleware import LAST_WRITE_COOKIE, LAST_WRITE_HEADER
+from app.profiling import instrument_engine
+import itertools
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,14 +18,169 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Async drivers for the same database (asyncpg for Postgres, aiosqlite for local SQLite runs)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    """Rewrite a sync database URL to use the matching async driver."""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# Optional read replicas (comma-separated); reads fall back to the primary when unset
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# How long reads touching a just-written user/meal are pinned to the primary
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Connection pool settings (per engine, per worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Pool telemetry
+POOL_CHECKOUT_WAIT = Histogram(
+    "campuseats_db_pool_checkout_wait_seconds", "Time spent waiting to check out a pooled connection",
+    labelnames=("engine",), buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+POOL_OVERFLOW_EVENTS = Counter(
+    "campuseats_db_pool_overflow", "Checkouts that had to open an overflow connection", labelnames=("engine",),
+)
+POOL_TIMEOUTS = Counter(
+    "campuseats_db_pool_timeouts", "Checkouts that gave up after DB_POOL_TIMEOUT", labelnames=("engine",),
+)
+
+
+class _TimedPoolMixin:
+    """Records checkout wait time, overflow and timeout events for a QueuePool."""
+    engine_label = "sync"
+
+    def _do_get(self):
+        overflow_before = self.overflow()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc(engine=self.engine_label)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, engine=self.engine_label)
+            overflow_after = self.overflow()
+            if overflow_after > 0 and overflow_after > overflow_before:
+                POOL_OVERFLOW_EVENTS.inc(engine=self.engine_label)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    engine_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+
+def pool_options(url: str, poolclass) -> dict:
+    """Engine keyword arguments for the configured pool (SQLite keeps its default pool)."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if not url.startswith("sqlite"):
+        options.update(
+            poolclass=poolclass,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL, TimedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 metadata = MetaData()
 
+# Async engine for `async def` routes, so DB waits don't block the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# One engine per read replica, handed out round-robin by get_read_db
+replica_engines = []
+for index, url in enumerate(DATABASE_REPLICA_URLS):
+    label = f"replica{index}"
+    poolclass = type(f"TimedReplicaPool{index}", (TimedQueuePool,), {"engine_label": label})
+    replica_engines.append((label, create_engine(url, **pool_options(url, poolclass))))
+ReplicaSessions = [sessionmaker(autocommit=False, autoflush=False, bind=replica) for _, replica in replica_engines]
+_next_replica = itertools.cycle(ReplicaSessions)
+
+# Per-route query counts/latency, slow-query log and N+1 detection
+for profiled in [engine, async_engine.sync_engine] + [replica for _, replica in replica_engines]:
+    instrument_engine(profiled)
+
+# Keys (user and meal IDs) written recently by this worker
+recent_writes = TTLCache(maxsize=10000, ttl=READ_YOUR_WRITES_SECONDS)
+
+
+def _pool_gauge(read):
+    def collect():
+        pools = [("sync", engine.pool), ("async", async_engine.sync_engine.pool)]
+        pools += [(label, replica.pool) for label, replica in replica_engines]
+        for label, pool in pools:
+            if isinstance(pool, QueuePool):
+                yield {"engine": label}, read(pool)
+    return collect
+
+Gauge("campuseats_db_pool_size", "Configured pool size", ("engine",), collect=_pool_gauge(lambda pool: pool.size()))
+Gauge("campuseats_db_pool_checked_out", "Connections currently checked out", ("engine",), collect=_pool_gauge(lambda pool: pool.checkedout()))
+Gauge("campuseats_db_pool_checked_in", "Idle connections in the pool", ("engine",), collect=_pool_gauge(lambda pool: pool.checkedin()))
+Gauge("campuseats_db_pool_overflow_in_use", "Overflow connections currently open", ("engine",), collect=_pool_gauge(lambda pool: max(pool.overflow(), 0)))
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def mark_recent_write(*keys):
+    """Pin reads of these user/meal IDs to the primary for READ_YOUR_WRITES_SECONDS."""
+    for key in keys:
+        if key is not None:
+            recent_writes.set(str(key), True)
+
+# Successful writes also hand the client its write time (see middleware.ReadYourWritesMiddleware):
+# requests carrying a recent one read from the primary on any worker, including list and search routes
+def wrote_recently(last_write) -> bool:
+    """Whether a client-reported write time (epoch seconds) is within READ_YOUR_WRITES_SECONDS."""
+    try:
+        age = time.time() - float(last_write)
+    except (TypeError, ValueError):
+        return False
+    return -1 <= age < READ_YOUR_WRITES_SECONDS  # A second of slack for clock skew between workers
+
+def _needs_primary(request: Request) -> bool:
+    if request.headers.get("x-consistency", "").lower() == "strong":
+        return True
+    if wrote_recently(request.headers.get(LAST_WRITE_HEADER)) or wrote_recently(request.cookies.get(LAST_WRITE_COOKIE)):
+        return True
+    return any(recent_writes.get(str(value)) for value in request.path_params.values())
+
+def get_read_db(request: Request):
+    """Session for read-only routes: a replica (round-robin) unless read-your-writes requires the primary."""
+    if not ReplicaSessions or _needs_primary(request):
+        db = SessionLocal()
+    else:
+        db = next(_next_replica)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
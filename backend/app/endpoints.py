@@ -1,14 +1,23 @@
 import json
-from fastapi import APIRouter, Depends, HTTPException, Request, Body, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Body, Header, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_async_db, get_read_db, mark_recent_write
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import Meal, User, Cart
-from app.schemas import MealCreate, MealUpdate, UserCreate, UserResponse, MealResponse, UserUpdate, TimeSlot, FullCartSchema, ReviewOut, ReviewCreate
-from app.crud import create_meal, get_meal, get_average_rating_for_chef, get_meals, update_meal, delete_meal, get_cart_with_meals, create_or_update_cart, get_chef_orders_by_chef, is_username_unique, get_menu, clear_user_cart
-from typing import List, Union
-from app.auth import get_current_user, upload_image_and_get_url  # Import authentication dependency
-
-router = APIRouter()
+from app.schemas import MealCreate, MealUpdate, UserCreate, UserResponse, MealResponse, MealSummary, UserUpdate, TimeSlot, FullCartSchema, ReviewOut, ReviewCreate, ChefOrderResponse, RatingSummaries
+from app.crud import create_meal_async, get_meal, get_average_rating_for_chef, get_meals, update_meal, delete_meal, get_cart_with_meals, create_or_update_cart, remove_cart_item, get_chef_orders_by_chef, is_username_unique, get_menu, clear_user_cart, get_reviews_for_meal, get_reviews_for_chef, create_review, get_rating_summaries, apply_image_upload, attach_rating_summaries, search_meals, get_meal_version, get_menu_version, get_reviews_version
+from app.conditional import conditional_response, make_etag, MEAL_CACHE_CONTROL, MENU_CACHE_CONTROL, REVIEWS_CACHE_CONTROL, OLDER_REVIEWS_CACHE_CONTROL
+from app.responses import FastJSONRoute, FastJSONResponse
+from app.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_distance_cursor, decode_created_at_cursor
+from app.timeslots import query_windows
+from app.order_feed import chef_order_events
+from app.images import image_uploader
+from typing import List, Optional, Union
+from app.auth import get_current_user, invalidate_cached_user, upload_image_and_get_url, verify_stream_token  # Import authentication dependency
+
+# Opt in to TypeAdapter/orjson serialisation for this router's (list-heavy) responses
+router = APIRouter(route_class=FastJSONRoute, default_response_class=FastJSONResponse)
 
 # User Routes
 @router.post("/api/users", response_model=UserResponse)
@@ -20,7 +29,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @router.get("/api/users/{user_id}", response_model=UserResponse)
-def get_user(user_id: str, db: Session = Depends(get_db)):
+def get_user(user_id: str, db: Session = Depends(get_read_db)):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -40,6 +49,8 @@ def update_user(user_update: UserUpdate, db: Session = Depends(get_db)):
 
     db.commit()
     db.refresh(user)  # Refresh instance to get updated values
+    invalidate_cached_user(user.id)
+    mark_recent_write(user.id)
 
     return user
 
@@ -54,8 +65,12 @@ def check_username(username: str, db: Session = Depends(get_db)):
 
 
 # Meal Routes
+
+# "HH:MM", 24-hour clock
+TIME_OF_DAY_PATTERN = r"^([01][0-9]|2[0-3]):[0-5][0-9]$"
+
 @router.post("/api/meals", response_model=MealResponse)
-async def create_meal_route(request: Request, db: Session = Depends(get_db)):
+async def create_meal_route(request: Request, db: AsyncSession = Depends(get_async_db)):
     form = await request.form()
     # Convert the ImmutableMultiDict to a dict
     meal_data = dict(form)
@@ -73,29 +88,96 @@ async def create_meal_route(request: Request, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"Error parsing meal data: {str(e)}")
     
-    return create_meal(db, meal, seller_id=meal.seller_id)
+    db_meal = await create_meal_async(db, meal, seller_id=meal.seller_id)
+    mark_recent_write(meal.seller_id, db_meal.id)
+    return db_meal
+
+# Declared before /meals/{meal_id} so "search" is not parsed as a meal ID
+@router.get("/meals/search", response_model=List[MealSummary])
+def search_meals_route(
+    q: str = Query(..., min_length=2, max_length=100),
+    user_lat: Optional[float] = None,
+    user_lon: Optional[float] = None,
+    radius: float = 250000.0,
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=50),
+    include_ratings: bool = False,
+    db: Session = Depends(get_read_db),
+):
+    """
+    Fuzzy, ranked search over meal names, ingredients and descriptions (typos tolerated).
+    Pass `user_lat`/`user_lon` to only return meals within `radius` meters, with their distance.
+    """
+    meals = search_meals(db, q, user_lat, user_lon, radius, skip, limit)
+    if include_ratings:
+        attach_rating_summaries(meals)
+    return meals
 
 @router.get("/meals/{meal_id}", response_model=MealResponse)
-def get_meal_route(meal_id: int, db: Session = Depends(get_db)):
+def get_meal_route(meal_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
+    """Supports If-None-Match / If-Modified-Since (304 without loading the meal)."""
+    version = get_meal_version(db, meal_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Meal not found")
+    meal_updated_at, _, seller_updated_at, _ = version
+    last_modified = max(filter(None, (meal_updated_at, seller_updated_at)), default=None)
+    not_modified = conditional_response(request, response, make_etag("meal", meal_id, *version), MEAL_CACHE_CONTROL, last_modified)
+    if not_modified:
+        return not_modified
+
     meal = get_meal(db, meal_id)
     if not meal:
         raise HTTPException(status_code=404, detail="Meal not found")
     return meal
 
-@router.get("/meals/chef/{userId}")
-def get_chef_menu(userId: str, db: Session = Depends(get_db)):
+@router.get("/meals/chef/{userId}", response_model=List[MealSummary])
+def get_chef_menu(userId: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
+    """Supports If-None-Match (304 without loading the menu)."""
+    version = get_menu_version(db, userId)
+    if version is None:
+        raise HTTPException(status_code=404, detail="No meals found for this seller")
+    # ETag only: deleting a meal does not move any timestamp, so Last-Modified could not notice it
+    not_modified = conditional_response(request, response, make_etag("menu", userId, *version), MENU_CACHE_CONTROL)
+    if not_modified:
+        return not_modified
+
     meals = get_menu(db, userId)
     if not meals:
         raise HTTPException(status_code=404, detail="No meals found for this seller")
     return meals
 
-@router.get("/meals/", response_model=List[MealResponse])
-def get_meals_route(user_lat: float, user_lon: float, radius: float = 250000.0, skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+@router.get("/meals/", response_model=List[MealSummary])
+def get_meals_route(
+    response: Response,
+    user_lat: float,
+    user_lon: float,
+    radius: float = 250000.0,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_ratings: bool = False,
+    available_at: Optional[str] = Query(None, pattern=TIME_OF_DAY_PATTERN),
+    available_until: Optional[str] = Query(None, pattern=TIME_OF_DAY_PATTERN),
+    db: Session = Depends(get_read_db),
+):
     """
-    API endpoint to fetch meals near a given location within a specified radius (in km),
+    API endpoint to fetch meals near a given location within a specified radius (in meters),
     sorted by distance and paginated.
+    Pass the `X-Next-Cursor` response header back as `cursor` to fetch the next page;
+    `skip` is still honoured when no cursor is given.
+    With `include_ratings=true` each meal and seller carries its `rating_summary`.
+    With `available_at` ("HH:MM") only meals with a pickup slot covering that time are returned;
+    add `available_until` to match any slot overlapping the window instead.
     """
-    return get_meals(db, user_lat, user_lon, radius, skip, limit)
+    if available_until and not available_at:
+        raise HTTPException(status_code=400, detail="available_until requires available_at")
+    available = query_windows(available_at, available_until) if available_at else None
+    meals = get_meals(db, user_lat, user_lon, radius, skip, limit, after=decode_distance_cursor(cursor), available=available)
+    if len(meals) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(meals[-1].sort_distance, meals[-1].id)
+    if include_ratings:
+        attach_rating_summaries(meals)
+    return meals
 
 
 
@@ -148,6 +230,13 @@ def update_meal_route(
     updated_meal = update_meal(db, meal_id, meal_update, seller_id=current_user.id)
     if not updated_meal:
         raise HTTPException(status_code=404, detail="Meal not found or unauthorized")
+    mark_recent_write(current_user.id, meal_id)
+
+    # An upload that finished before this commit found no meal to record its thumbnail on
+    finished_upload = image_uploader.finished(image_url) if image_url else None
+    if finished_upload:
+        apply_image_upload(db, finished_upload)
+        db.refresh(updated_meal)
 
     return updated_meal
 
@@ -157,6 +246,7 @@ def delete_meal_route(meal_id: int, db: Session = Depends(get_db), current_user:
     deleted_meal = delete_meal(db, meal_id)
     if not deleted_meal:
         raise HTTPException(status_code=404, detail="Meal not found or unauthorized")
+    mark_recent_write(current_user.id, meal_id)
     return deleted_meal
 
 
@@ -169,28 +259,8 @@ def update_cart(user_id: str, items: list = Body(...), db: Session = Depends(get
     return create_or_update_cart(db, user_id, items)
 
 @router.delete("/api/cart/{user_id}/{meal_id}", response_model=FullCartSchema)
-def remove_cart_item(user_id: str, meal_id: int, db: Session = Depends(get_db)):
-    cart = db.query(Cart).filter(Cart.user_id == user_id).first()
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-
-    # Deserialize JSON cart items
-    try:
-        items = json.loads(cart.cart_items) if isinstance(cart.cart_items, str) else cart.cart_items
-    except Exception:
-        items = []
-
-    # Filter out the meal to remove
-    items = [item for item in items if item.get("meal_id") != meal_id]
-
-    # Update the cart_items JSON field
-    cart.cart_items = items
-
-    db.commit()
-    db.refresh(cart)
-
-    # Return enriched cart data (dict with meal details)
-    return get_cart_with_meals(db, user_id)
+def remove_cart_item_route(user_id: str, meal_id: int, db: Session = Depends(get_db)):
+    return remove_cart_item(db, user_id, meal_id)
 
 
 @router.post("/api/clear-cart")
@@ -201,23 +271,75 @@ async def clear_cart(user=Depends(get_current_user), db: Session = Depends(get_d
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to clear cart")
     
-@router.get("/api/orders/{user_id}")
+@router.get("/api/orders/{user_id}", response_model=List[ChefOrderResponse])
 def read_chef_orders(user_id: str, db: Session = Depends(get_db)):
     return get_chef_orders_by_chef(db, user_id)
 
+@router.get("/api/orders/{user_id}/stream")
+async def stream_chef_orders(user_id: str, cursor: Optional[str] = None, last_event_id: Optional[str] = Header(None), token_data: dict = Depends(verify_stream_token)):
+    """
+    Server-Sent Events feed of the chef's new and updated orders (`chef_order` events, the same
+    objects as GET /api/orders/{user_id}), for the chef only. Browsers resume with Last-Event-ID
+    after a reconnect; `cursor` (an event ID) resumes a fresh connection.
+    """
+    if token_data["uid"] != user_id:
+        raise HTTPException(status_code=403, detail="You can only stream your own orders")
+    after = decode_created_at_cursor(last_event_id or cursor)
+    return StreamingResponse(
+        chef_order_events(user_id, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @router.post("/reviews/create", response_model=ReviewOut, status_code=status.HTTP_201_CREATED)
-def create_review(review: ReviewCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    return create_review(db, review, user.id)
+def create_review_route(review: ReviewCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    db_review = create_review(db, review, user.id)
+    invalidate_cached_user(db_review.chef_id)
+    mark_recent_write(db_review.chef_id, db_review.meal_id)
+    return db_review
+
+def _set_review_cursor(response: Response, reviews: list, limit: int):
+    if len(reviews) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(reviews[-1].created_at, reviews[-1].id)
+
+def _reviews_not_modified(request: Request, response: Response, kind: str, owner_id: str, version: tuple, limit: int, cursor: Optional[str]):
+    etag = make_etag(kind, owner_id, limit, cursor, *version)
+    return conditional_response(request, response, etag, OLDER_REVIEWS_CACHE_CONTROL if cursor else REVIEWS_CACHE_CONTROL)
 
 @router.get("/meal/{meal_id}", response_model=List[ReviewOut])
-def get_reviews_for_meal(meal_id: str, db: Session = Depends(get_db)):
-    return get_reviews_for_meal(db, meal_id)
+def get_reviews_for_meal_route(meal_id: str, request: Request, response: Response, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    after = decode_created_at_cursor(cursor)
+    not_modified = _reviews_not_modified(request, response, "meal-reviews", meal_id, get_reviews_version(db, meal_id=meal_id), limit, cursor)
+    if not_modified:
+        return not_modified
+    reviews = get_reviews_for_meal(db, meal_id, limit, after=after)
+    _set_review_cursor(response, reviews, limit)
+    return reviews
 
 @router.get("/chef/{chef_id}", response_model=List[ReviewOut])
-def get_reviews_for_chef(chef_id: str, db: Session = Depends(get_db)):
-    return get_reviews_for_chef(db, chef_id)
+def get_reviews_for_chef_route(chef_id: str, request: Request, response: Response, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    after = decode_created_at_cursor(cursor)
+    not_modified = _reviews_not_modified(request, response, "chef-reviews", chef_id, get_reviews_version(db, chef_id=chef_id), limit, cursor)
+    if not_modified:
+        return not_modified
+    reviews = get_reviews_for_chef(db, chef_id, limit, after=after)
+    _set_review_cursor(response, reviews, limit)
+    return reviews
 
 @router.get("/chef/{chefId}/summary")
-def get_chef_rating_summary(chefId: str, db: Session = Depends(get_db)):
-    return get_average_rating_for_chef(db, chefId)
\ No newline at end of file
+def get_chef_rating_summary(chefId: str, db: Session = Depends(get_read_db)):
+    return get_average_rating_for_chef(db, chefId)
+
+# Cap on IDs per kind in one batch request
+MAX_RATING_SUMMARY_IDS = 100
+
+@router.get("/ratings/summary", response_model=RatingSummaries)
+def get_rating_summaries_route(chef_ids: List[str] = Query([]), meal_ids: List[int] = Query([]), db: Session = Depends(get_read_db)):
+    """
+    Rating summaries for several chefs and/or meals in one request, e.g.
+    /ratings/summary?chef_ids=a&chef_ids=b&meal_ids=1
+    """
+    if len(chef_ids) > MAX_RATING_SUMMARY_IDS or len(meal_ids) > MAX_RATING_SUMMARY_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RATING_SUMMARY_IDS} chef IDs and {MAX_RATING_SUMMARY_IDS} meal IDs per request")
+    return get_rating_summaries(db, chef_ids, meal_ids)
\ No newline at end of file
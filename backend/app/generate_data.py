@@ -0,0 +1,340 @@
+import argparse
+import csv
+import itertools
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from faker import Faker
+from sqlalchemy import func, select, text
+from app.database import engine
+from app.models import Base, Cart, ChefOrder, Meal, Order, Review, User, order_meal_association
+from app.geo import grid_cell
+from app.backfill_ratings import recompute_rating_aggregates
+from app.backfill_timeslots import rebuild_timeslot_index
+from app.sqlite_compat import use_json_for_sqlite_jsonb
+
+# Synthetic data at scale, for load and query-plan testing (not for demo data; see the seed_* scripts)
+#
+# Run from the backend directory, e.g.:
+#   python -m app.generate_data --users 100000 --meals 1000000 --orders 500000
+#
+# Postgres is loaded with COPY; other databases with executemany (SQLite stores the JSONB columns as
+# JSON). Users are keyed by --prefix, so run again with a different prefix (or --reset) to add more data.
+
+CHUNK_SIZE = 20000
+
+# Rough bounding box of the contiguous US, where campus centers are placed
+LAT_RANGE = (25.0, 49.0)
+LON_RANGE = (-124.0, -67.0)
+
+MEAL_WORDS = {
+    "style": ["Spicy", "Smoky", "Grilled", "Crispy", "Homestyle", "Garlic", "Lemon", "Herb", "Sweet", "Classic"],
+    "base": ["Chicken", "Tofu", "Beef", "Paneer", "Salmon", "Veggie", "Pork", "Shrimp", "Mushroom", "Lentil"],
+    "dish": ["Tacos", "Curry", "Ramen", "Burrito Bowl", "Stir Fry", "Pasta", "Sandwich", "Salad", "Dumplings", "Rice Bowl"],
+}
+INGREDIENTS = ["rice", "beans", "onion", "garlic", "ginger", "tomato", "cilantro", "lime", "cheese", "peppers",
+               "noodles", "soy sauce", "spinach", "potato", "corn", "avocado", "egg", "basil", "chili", "yogurt"]
+REVIEW_TEXT = ["Delicious!", "Would order again.", "Generous portions.", "A bit too salty.", "Arrived warm and fresh.",
+               "Great value for the price.", "Not my favourite.", "Best meal on campus!", None, None]
+# Ratings skew positive, as they do on real marketplaces
+RATING_WEIGHTS = [3, 4, 10, 30, 53]
+
+
+def make_campuses(count, rng):
+    """Campus centers with Zipf-like weights: a few large campuses, many small ones."""
+    campuses = []
+    for rank in range(1, count + 1):
+        campuses.append({
+            "lat": rng.uniform(*LAT_RANGE),
+            "lon": rng.uniform(*LON_RANGE),
+            "spread": rng.uniform(0.005, 0.03),  # degrees; ~0.5-3 km
+            "weight": 1 / rank,
+        })
+    return campuses
+
+
+def jitter(campus, rng):
+    return campus["lat"] + rng.gauss(0, campus["spread"]), campus["lon"] + rng.gauss(0, campus["spread"])
+
+
+def random_timestamp(rng, now, days=365):
+    return now - timedelta(seconds=rng.randrange(days * 86400))
+
+
+def random_timeslots(rng):
+    slots = []
+    for start_hour in sorted(rng.sample(range(7, 22), rng.randint(1, 3))):
+        slots.append({"start": f"{start_hour:02d}:00", "end": f"{start_hour + 1:02d}:00"})
+    return slots
+
+
+def _copy_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def bulk_load(table, rows):
+    """Insert dict rows into a table in chunks: COPY on Postgres (psycopg2), executemany elsewhere."""
+    table = getattr(table, "__table__", table)
+    use_copy = engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+    loaded = 0
+
+    def flush(chunk):
+        if use_copy:
+            columns = list(chunk[0])
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in chunk:
+                writer.writerow([_copy_value(row[column]) for column in columns])
+            buffer.seek(0)
+            raw = engine.raw_connection()
+            try:
+                with raw.cursor() as cursor:
+                    cursor.copy_expert(
+                        f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+                    )
+                raw.commit()
+            finally:
+                raw.close()
+        else:
+            with engine.begin() as conn:
+                conn.execute(table.insert(), chunk)
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            flush(chunk)
+            loaded += len(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+        loaded += len(chunk)
+    return loaded
+
+
+def next_id(model):
+    with engine.connect() as conn:
+        return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def reset_sequences():
+    """Explicit ids bypass Postgres serial sequences; move them past the loaded rows."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for model in (Meal, ChefOrder, Cart, Review):
+            table = model.__tablename__
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+            ))
+        conn.execute(text("ANALYZE"))
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.now = datetime.utcnow()
+        self.campuses = make_campuses(args.campuses, self.rng)
+        self.campus_weights = list(itertools.accumulate(campus["weight"] for campus in self.campuses))
+
+        self.user_campus = {}        # user id -> campus index
+        self.sellers_by_campus = {}  # campus index -> [seller ids]
+        self.buyers = []
+        self.meals_by_campus = {}    # campus index -> [(meal id, seller id, price)]
+
+    def pick_campus(self):
+        return self.rng.choices(range(len(self.campuses)), cum_weights=self.campus_weights)[0]
+
+    def users(self):
+        faker = Faker()
+        Faker.seed(self.args.seed)
+        first_names = [faker.first_name() for _ in range(500)]
+        last_names = [faker.last_name() for _ in range(500)]
+
+        for i in range(self.args.users):
+            user_id = f"{self.args.prefix}-user-{i}"
+            campus = self.pick_campus()
+            is_seller = self.rng.random() < self.args.seller_ratio
+            self.user_campus[user_id] = campus
+            if is_seller:
+                self.sellers_by_campus.setdefault(campus, []).append(user_id)
+            else:
+                self.buyers.append(user_id)
+            yield {
+                "id": user_id,
+                "first_name": self.rng.choice(first_names),
+                "last_name": self.rng.choice(last_names),
+                "email": f"{user_id}@example.edu",
+                "username": user_id,
+                "role": "seller" if is_seller else "buyer",
+                "created_at": random_timestamp(self.rng, self.now),
+                "is_verified": self.rng.random() < 0.7,
+            }
+
+    def meals(self):
+        campuses = list(self.sellers_by_campus)
+        weights = list(itertools.accumulate(self.campuses[campus]["weight"] for campus in campuses))
+        meal_id = next_id(Meal)
+        for _ in range(self.args.meals):
+            campus = self.rng.choices(campuses, cum_weights=weights)[0]
+            seller_id = self.rng.choice(self.sellers_by_campus[campus])
+            latitude, longitude = jitter(self.campuses[campus], self.rng)
+            price = round(self.rng.uniform(4, 20), 2)
+            unlimited = self.rng.random() < 0.1
+            created_at = random_timestamp(self.rng, self.now)
+            self.meals_by_campus.setdefault(campus, []).append((meal_id, seller_id, price))
+            yield {
+                "id": meal_id,
+                "name": " ".join(self.rng.choice(words) for words in MEAL_WORDS.values()),
+                "description": "Homemade and freshly prepared.",
+                "ingredients": ", ".join(self.rng.sample(INGREDIENTS, self.rng.randint(3, 7))),
+                "price": price,
+                "quantity": None if unlimited else self.rng.randint(1, 30),
+                "image_url": None,
+                "seller_id": seller_id,
+                "latitude": latitude,
+                "longitude": longitude,
+                "geo_cell": grid_cell(latitude, longitude),
+                "timeslots": random_timeslots(self.rng),
+                "unlimited": unlimited,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+            meal_id += 1
+
+    def nearby_meals(self, buyer_id, count):
+        """Meals from the buyer's campus (or any campus with meals when theirs has none)."""
+        meals = self.meals_by_campus.get(self.user_campus[buyer_id])
+        if not meals:
+            meals = self.meals_by_campus[self.rng.choice(list(self.meals_by_campus))]
+        return self.rng.sample(meals, min(count, len(meals)))
+
+    def carts(self):
+        cart_id = next_id(Cart)
+        for buyer_id in self.buyers:
+            if self.rng.random() >= self.args.cart_ratio:
+                continue
+            items = [
+                {"meal_id": meal_id, "name": "Generated meal", "price": price, "quantity": self.rng.randint(1, 3)}
+                for meal_id, _, price in self.nearby_meals(buyer_id, self.rng.randint(1, 5))
+            ]
+            yield {"id": cart_id, "user_id": buyer_id, "cart_items": items, "updated_at": random_timestamp(self.rng, self.now, days=30)}
+            cart_id += 1
+
+    def orders(self):
+        """Yields (table, row) pairs for orders, their meal associations, chef orders and reviews."""
+        chef_order_id = next_id(ChefOrder)
+        review_id = next_id(Review)
+        for _ in range(self.args.orders):
+            buyer_id = self.rng.choice(self.buyers)
+            meals = self.nearby_meals(buyer_id, self.rng.randint(1, 3))
+            quantities = [self.rng.choices((1, 2, 3), (70, 25, 5))[0] for _ in meals]
+            order_id = f"{self.args.prefix}-order-{self.rng.getrandbits(64):016x}"
+            created_at = random_timestamp(self.rng, self.now)
+            status = self.rng.choices(["completed", "pending", "canceled"], [85, 10, 5])[0]
+
+            # Reviews are one per order (as POST /reviews/ enforces), for one of its meals
+            reviewed = status == "completed" and self.rng.random() < self.args.review_ratio
+            reviewed_meal = self.rng.randrange(len(meals)) if reviewed else None
+
+            yield Order, {
+                "id": order_id,
+                "buyer_id": buyer_id,
+                "total_price": round(sum(price * quantity for (_, _, price), quantity in zip(meals, quantities)), 2),
+                "status": status,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+            for index, ((meal_id, seller_id, _), quantity) in enumerate(zip(meals, quantities)):
+                yield order_meal_association, {"order_id": order_id, "meal_id": meal_id, "quantity": quantity}
+                yield ChefOrder, {
+                    "id": chef_order_id,
+                    "order_id": order_id,
+                    "buyer_id": buyer_id,
+                    "meal_id": meal_id,
+                    "chef_id": seller_id,
+                    "quantity": quantity,
+                    "status": status,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+                chef_order_id += 1
+
+                if index == reviewed_meal:
+                    reviewed_at = min(self.now, created_at + timedelta(hours=self.rng.randint(1, 72)))
+                    yield Review, {
+                        "id": review_id,
+                        "reviewer_id": buyer_id,
+                        "chef_id": seller_id,
+                        "meal_id": meal_id,
+                        "order_id": order_id,
+                        "rating": self.rng.choices(range(1, 6), RATING_WEIGHTS)[0],
+                        "review_text": self.rng.choice(REVIEW_TEXT),
+                        "created_at": reviewed_at,
+                        "updated_at": reviewed_at,
+                    }
+                    review_id += 1
+
+
+def _timed(label, load):
+    start = time.perf_counter()
+    count = load()
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {count} rows in {elapsed:.1f}s ({count / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+def run(args):
+    if engine.dialect.name == "sqlite":
+        use_json_for_sqlite_jsonb()
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    generator = Generator(args)
+    _timed("users", lambda: bulk_load(User, generator.users()))
+    if not generator.sellers_by_campus or not generator.buyers:
+        print("Need at least one seller and one buyer; increase --users or adjust --seller-ratio")
+        return
+    _timed("meals", lambda: bulk_load(Meal, generator.meals()))
+    _timed("carts", lambda: bulk_load(Cart, generator.carts()))
+
+    # Orders fan out into four tables; buffer per table and load parents first
+    def load_orders():
+        tables = [Order, order_meal_association, ChefOrder, Review]
+        pending = {table: [] for table in tables}
+        loaded = 0
+        for table, row in generator.orders():
+            pending[table].append(row)
+            if len(pending[Order]) >= CHUNK_SIZE:
+                loaded += sum(bulk_load(t, pending[t]) for t in tables)
+                pending = {table: [] for table in tables}
+        loaded += sum(bulk_load(t, pending[t]) for t in tables if pending[t])
+        return loaded
+
+    _timed("orders, chef orders and reviews", load_orders)
+    reset_sequences()
+
+    chefs, meals = recompute_rating_aggregates()
+    print(f"rating aggregates: {chefs} chefs, {meals} meals")
+    _timed("meal timeslots", rebuild_timeslot_index)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic CampusEats data at scale")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--meals", type=int, default=100000)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--campuses", type=int, default=200)
+    parser.add_argument("--seller-ratio", type=float, default=0.1, help="Fraction of users who sell meals")
+    parser.add_argument("--cart-ratio", type=float, default=0.2, help="Fraction of buyers with an open cart")
+    parser.add_argument("--review-ratio", type=float, default=0.3, help="Fraction of completed orders reviewed")
+    parser.add_argument("--prefix", default="gen", help="Prefix for generated user and order ids")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first (destroys data)")
+    run(parser.parse_args())
@@ -0,0 +1,80 @@
+from math import radians, degrees, cos, sin, asin, acos, floor
+from typing import List, Optional, Tuple
+
+EARTH_RADIUS_M = 6371000  # Earth's radius in meters
+
+# Size of one grid cell in degrees (~5.5 km of latitude)
+GRID_CELL_DEG = 0.05
+GRID_COLUMNS = int(360 / GRID_CELL_DEG)
+
+# Above this many candidate cells the `IN (...)` list stops paying for itself
+# and the bounding box on idx_meal_location alone is used instead
+MAX_CANDIDATE_CELLS = 64
+
+# Distance cursors of GET /meals/ may come from the tile cache (Python) or the database, whose math
+# libraries can disagree in the last bits. Each side re-derives the cursor meal's distance with its
+# own formula; a difference above this (meters) means the meal has moved, and the cursor is kept
+CURSOR_DISTANCE_SLACK_M = 0.01
+
+
+def grid_cell(lat: float, lon: float) -> int:
+    """Returns the integer id of the grid cell containing a latitude/longitude point."""
+    row = floor((lat + 90) / GRID_CELL_DEG)
+    col = floor((lon + 180) / GRID_CELL_DEG) % GRID_COLUMNS
+    return row * GRID_COLUMNS + col
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle distance in meters, by the same spherical law of cosines as crud.distance_expression
+    so distances computed in Python rank meals exactly like the SQL query.
+    """
+    cosine = cos(radians(lat1)) * cos(radians(lat2)) * cos(radians(lon2) - radians(lon1)) + sin(radians(lat1)) * sin(radians(lat2))
+    return EARTH_RADIUS_M * acos(max(-1.0, min(1.0, cosine)))
+
+
+def cursor_distance(sent: float, recomputed: Optional[float]) -> float:
+    """Distance to page after: the cursor meal's distance as computed locally, unless it has moved or gone."""
+    if recomputed is None or abs(recomputed - sent) > CURSOR_DISTANCE_SLACK_M:
+        return sent
+    return recomputed
+
+
+def bounding_box(lat: float, lon: float, radius_m: float) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Returns (min_lat, max_lat, min_lon, max_lon) enclosing every point within
+    `radius_m` meters of the given location.
+    Returns None when the circle covers a pole or crosses the antimeridian,
+    in which case callers should skip the prefilter.
+    """
+    angular_radius = radius_m / EARTH_RADIUS_M
+    delta_lat = degrees(angular_radius)
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return None
+
+    # Widest longitude span of a spherical cap that does not contain a pole
+    delta_lon = degrees(asin(sin(angular_radius) / cos(radians(lat))))
+    min_lon, max_lon = lon - delta_lon, lon + delta_lon
+    if min_lon < -180 or max_lon >= 180:
+        return None
+
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def candidate_cells(box: Tuple[float, float, float, float]) -> Optional[List[int]]:
+    """Returns the grid cells overlapping a bounding box, or None if there are too many to be useful."""
+    min_lat, max_lat, min_lon, max_lon = box
+    first_row = floor((min_lat + 90) / GRID_CELL_DEG)
+    last_row = floor((max_lat + 90) / GRID_CELL_DEG)
+    first_col = floor((min_lon + 180) / GRID_CELL_DEG)
+    last_col = floor((max_lon + 180) / GRID_CELL_DEG)
+
+    if (last_row - first_row + 1) * (last_col - first_col + 1) > MAX_CANDIDATE_CELLS:
+        return None
+
+    return [
+        row * GRID_COLUMNS + col
+        for row in range(first_row, last_row + 1)
+        for col in range(first_col, last_col + 1)
+    ]
@@ -0,0 +1,261 @@
+import heapq
+import os
+import threading
+from array import array
+from math import floor
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.cache import TTLCache
+from app.geo import cursor_distance, distance_m
+from app.metrics import Counter, Gauge
+from app.models import Meal
+
+# Location-tile cache for GET /meals/. Students on one campus send nearly identical coordinates, so
+# nearby meals are looked up per tile: an entry holds the ID and position of every meal that any
+# point of the tile can reach within a radius bucket, and each request ranks those candidates by its
+# own exact distance, so responses are the same as an uncached query.
+#
+# Meal writes made through the ORM drop this worker's entries covering the meal once their transaction
+# commits, and entries are loaded from the primary (see crud.get_meals), so this worker serves the
+# write from then on. Other workers are not told: they keep their entries until the TTL expires, so
+# cross-worker consistency is bounded by MEAL_CACHE_TTL_SECONDS.
+
+MEAL_CACHE_SIZE = int(os.getenv("MEAL_CACHE_SIZE", "512"))  # Entries per worker (0 disables the cache)
+MEAL_CACHE_TTL_SECONDS = float(os.getenv("MEAL_CACHE_TTL_SECONDS", "60"))
+MEAL_CACHE_TILE_DEG = float(os.getenv("MEAL_CACHE_TILE_DEG", "0.01"))  # ~1.1 km of latitude
+
+# Candidates kept per entry (~24 bytes each). Denser tiles keep the ones nearest the tile center,
+# which still answer the first pages exactly; deeper pages fall back to the database
+MEAL_CACHE_MAX_CANDIDATES = int(os.getenv("MEAL_CACHE_MAX_CANDIDATES", "5000"))
+
+# Requested radii are rounded up to one of these (meters); larger radii bypass the cache
+RADIUS_BUCKETS_M = (1000, 2000, 5000, 10000, 25000, 50000, 100000, 250000)
+
+# Outcomes: hit, miss (entry loaded), bypass (cache off or radius too large), incomplete (the page
+# reaches past a truncated entry; answered by the database)
+LOOKUPS = Counter("meal_cache_lookups", "Nearby meal cache lookups by outcome", ("outcome",))
+INVALIDATIONS = Counter("meal_cache_invalidations", "Nearby meal cache entries dropped by meal writes")
+
+# Meal columns whose changes can move a meal in or out of a nearby listing
+LISTED_COLUMNS = ("latitude", "longitude", "timeslots")
+
+Loader = Callable[[float, float, float, int], List[Tuple[int, float, float, float]]]
+
+
+class TileEntry(NamedTuple):
+    center_lat: float
+    center_lon: float
+    complete_m: float  # Every meal nearer than this to the center is a candidate
+    ids: array  # Candidates, nearest the center first
+    lats: array
+    lons: array
+    center_distances: array
+
+
+def radius_bucket(radius: float) -> Optional[int]:
+    return next((bucket for bucket in RADIUS_BUCKETS_M if radius <= bucket), None)
+
+
+def tile_of(lat: float, lon: float, tile_deg: float) -> Tuple[int, int]:
+    return floor((lat + 90) / tile_deg), floor((lon + 180) / tile_deg)
+
+
+def tile_center(row: int, col: int, tile_deg: float) -> Tuple[float, float, float]:
+    """Center of a tile and the distance from it to the tile's farthest corner (meters)."""
+    min_lat, min_lon = row * tile_deg - 90, col * tile_deg - 180
+    center_lat, center_lon = min_lat + tile_deg / 2, min_lon + tile_deg / 2
+    corners = [(lat, lon) for lat in (min_lat, min_lat + tile_deg) for lon in (min_lon, min_lon + tile_deg)]
+    return center_lat, center_lon, max(distance_m(center_lat, center_lon, lat, lon) for lat, lon in corners)
+
+
+class NearbyMealsCache:
+    """
+    Candidate meals per (tile, radius bucket, availability windows), in a TTL + LRU cache.
+    A load that raced with an invalidation is served but not stored, so in this worker a committed
+    write is never masked by a candidate list read before it committed (in other workers it can be,
+    until the entry expires).
+    """
+
+    def __init__(self, maxsize: int, ttl: float, tile_deg: float, max_candidates: int):
+        self.tile_deg = tile_deg
+        self.max_candidates = max_candidates
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl) if maxsize > 0 else None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._entries is not None
+
+    def __len__(self):
+        return len(self._entries) if self.enabled else 0
+
+    def _entry(self, lat: float, lon: float, radius: float, windows, load: Loader) -> Optional[TileEntry]:
+        bucket = radius_bucket(radius)
+        if not self.enabled or bucket is None:
+            LOOKUPS.inc(outcome="bypass")
+            return None
+
+        row, col = tile_of(lat, lon, self.tile_deg)
+        key = (row, col, bucket, tuple(windows or ()))
+        entry = self._entries.get(key)
+        if entry is not None:
+            LOOKUPS.inc(outcome="hit")
+            return entry
+
+        LOOKUPS.inc(outcome="miss")
+        generation = self._generation
+        center_lat, center_lon, half_diagonal = tile_center(row, col, self.tile_deg)
+        complete_m = bucket + half_diagonal + 1  # 1 m of slack for rounding
+        rows = load(center_lat, center_lon, complete_m, self.max_candidates + 1)
+        if len(rows) > self.max_candidates:
+            # Rows come nearest first: everything nearer than the first one left out is kept
+            complete_m = rows[self.max_candidates][3]
+            rows = rows[:self.max_candidates]
+        entry = TileEntry(
+            center_lat, center_lon, complete_m,
+            array("q", (row[0] for row in rows)),
+            array("d", (row[1] for row in rows)),
+            array("d", (row[2] for row in rows)),
+            array("d", (row[3] for row in rows)),
+        )
+        with self._lock:
+            if generation == self._generation:
+                self._entries.set(key, entry)
+        return entry
+
+    @staticmethod
+    def _candidate_distance(entry: TileEntry, lat: float, lon: float, meal_id: int) -> Optional[float]:
+        try:
+            index = entry.ids.index(meal_id)
+        except ValueError:
+            return None
+        return distance_m(lat, lon, entry.lats[index], entry.lons[index])
+
+    def nearest(self, lat: float, lon: float, radius: float, windows, load: Loader,
+                skip: int = 0, limit: int = 10, after: Optional[Tuple[float, int]] = None) -> Optional[List[Tuple[float, int]]]:
+        """
+        One page of (exact distance, meal ID) within `radius` meters of (lat, lon), nearest first with
+        ties by ID, paginated like crud.get_meals. Returns None when the cache cannot answer
+        (disabled, radius too large, or the page reaches past a truncated entry); the caller then
+        queries directly. `load(center_lat, center_lon, cover_m, limit)` returns up to `limit`
+        (meal ID, latitude, longitude, distance from the center) rows within `cover_m` meters of the
+        tile center that match the windows, nearest first.
+        """
+        wanted = limit if after else skip + limit
+        if wanted <= 0:
+            return []
+        entry = self._entry(lat, lon, radius, windows, load)
+        if entry is None:
+            return None
+        if after is not None:  # The cursor may have been built by the database (see geo.cursor_distance)
+            after = (cursor_distance(after[0], self._candidate_distance(entry, lat, lon, after[1])), after[1])
+
+        # A candidate is at least (center distance - offset) from this point (triangle inequality),
+        # so meals nearer than `exact_m` are all candidates and the scan can stop early
+        offset_m = distance_m(entry.center_lat, entry.center_lon, lat, lon) + 1
+        reach_m = entry.complete_m - offset_m
+        exact_m = min(radius, reach_m)
+
+        best = []  # Max-heap of the `wanted` nearest as (-distance, -meal ID)
+        for meal_id, meal_lat, meal_lon, center_distance in zip(entry.ids, entry.lats, entry.lons, entry.center_distances):
+            lower_bound = center_distance - offset_m
+            if lower_bound >= exact_m or (len(best) == wanted and lower_bound > -best[0][0]):
+                break
+            distance = distance_m(lat, lon, meal_lat, meal_lon)
+            if distance >= exact_m or (after is not None and (distance, meal_id) <= after):
+                continue
+            if len(best) < wanted:
+                heapq.heappush(best, (-distance, -meal_id))
+            elif (-distance, -meal_id) > best[0]:
+                heapq.heapreplace(best, (-distance, -meal_id))
+
+        if reach_m < radius and len(best) < wanted:
+            LOOKUPS.inc(outcome="incomplete")
+            return None
+        page = sorted((-distance, -meal_id) for distance, meal_id in best)
+        return page if after else page[skip:]
+
+    def invalidate_near(self, points: List[Tuple[float, float]]) -> int:
+        """Drop every entry whose candidates could include a meal at one of the points."""
+        if not self.enabled or not points:
+            return 0
+
+        def covers(key, entry: TileEntry):
+            return any(distance_m(entry.center_lat, entry.center_lon, lat, lon) <= entry.complete_m for lat, lon in points)
+
+        with self._lock:
+            self._generation += 1
+            dropped = self._entries.invalidate_where(covers)
+        if dropped:
+            INVALIDATIONS.inc(dropped)
+        return dropped
+
+    def clear(self):
+        if self.enabled:
+            with self._lock:
+                self._generation += 1
+                self._entries.clear()
+
+
+nearby_meals_cache = NearbyMealsCache(
+    maxsize=MEAL_CACHE_SIZE,
+    ttl=MEAL_CACHE_TTL_SECONDS,
+    tile_deg=MEAL_CACHE_TILE_DEG,
+    max_candidates=MEAL_CACHE_MAX_CANDIDATES,
+)
+
+Gauge("meal_cache_entries", "Tiles currently held in the nearby meal cache", collect=lambda: [({}, len(nearby_meals_cache))])
+
+
+def _meal_points(meal: Meal, changed_only: bool) -> Optional[List[Tuple[float, float]]]:
+    """
+    Old and new positions of a meal written in this flush (none unless a listed column changed when
+    `changed_only`), or None when its position was never loaded and so is unknown.
+    """
+    state = inspect(meal)
+    histories = {column: state.attrs[column].history for column in LISTED_COLUMNS}
+    if changed_only and not any(history.has_changes() for history in histories.values()):
+        return []
+    if "latitude" not in state.dict or "longitude" not in state.dict:
+        return None
+
+    def positions(side):
+        lats = getattr(histories["latitude"], side) or [state.dict["latitude"]]
+        lons = getattr(histories["longitude"], side) or [state.dict["longitude"]]
+        return [(lat, lon) for lat, lon in zip(lats, lons) if lat is not None and lon is not None]
+
+    return positions("deleted") + positions("added")
+
+
+# Positions touched by meal writes are collected at flush and invalidated once the transaction commits
+@event.listens_for(Session, "after_flush")
+def _collect_meal_writes(session, flush_context):
+    if not nearby_meals_cache.enabled:
+        return
+    written = [(meal, False) for meal in session.new] + [(meal, True) for meal in session.dirty] + [(meal, False) for meal in session.deleted]
+    for meal, changed_only in written:
+        if not isinstance(meal, Meal):
+            continue
+        points = _meal_points(meal, changed_only)
+        if points is None:
+            session.info["meal_cache_clear"] = True
+        elif points:
+            session.info.setdefault("meal_cache_points", []).extend(points)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_meal_writes(session):
+    points = session.info.pop("meal_cache_points", [])
+    if session.info.pop("meal_cache_clear", False):
+        nearby_meals_cache.clear()
+    else:
+        nearby_meals_cache.invalidate_near(points)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_meal_writes(session):
+    session.info.pop("meal_cache_points", None)
+    session.info.pop("meal_cache_clear", None)
@@ -0,0 +1,193 @@
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Callable, NamedTuple, Optional
+
+from fastapi import HTTPException
+from firebase_admin import storage
+from PIL import Image, ImageOps
+from app.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Folder for pipeline uploads; images here always have WebP variants next to them
+UPLOAD_PREFIX = "meal-images"
+
+# Derived sizes written next to every original (longest edge in pixels)
+IMAGE_VARIANTS = {
+    "thumb": 320,
+    "medium": 960,
+}
+WEBP_QUALITY = 80
+
+# Accepted upload formats (as decoded by Pillow) and the extension they are stored under
+UPLOAD_FORMATS = {
+    "JPEG": "jpg",
+    "PNG": "png",
+    "WEBP": "webp",
+    "GIF": "gif",
+}
+
+# "firebase" (default) or "local"
+IMAGE_STORAGE_BACKEND = os.getenv("IMAGE_STORAGE_BACKEND", "firebase")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "./media")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL", "http://localhost:8000/media")
+
+
+class FirebaseStorageBackend:
+    """Stores images in the default Firebase Storage bucket."""
+
+    def public_url(self, path: str) -> str:
+        return storage.bucket().blob(path).public_url
+
+    def exists(self, path: str) -> bool:
+        return storage.bucket().blob(path).exists()
+
+    def save(self, path: str, data: bytes, content_type: str):
+        blob = storage.bucket().blob(path)
+        blob.upload_from_string(data, content_type=content_type)
+        blob.make_public()
+
+
+class LocalStorageBackend:
+    """Stores images on the local filesystem (for offline development and tests)."""
+
+    def __init__(self, root_dir: str, base_url: str):
+        self.root_dir = root_dir
+        self.base_url = base_url.rstrip("/")
+
+    def public_url(self, path: str) -> str:
+        return f"{self.base_url}/{path}"
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(os.path.join(self.root_dir, path))
+
+    def save(self, path: str, data: bytes, content_type: str):
+        full_path = os.path.join(self.root_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        tmp_path = f"{full_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, full_path)
+
+
+def variant_path(path: str, variant: str) -> str:
+    """meal-images/<id>.jpg -> meal-images/<id>_<variant>.webp"""
+    base, _ = os.path.splitext(path)
+    return f"{base}_{variant}.webp"
+
+
+def upload_path_for(image_url: Optional[str]) -> Optional[str]:
+    """Storage path of an image written by the upload pipeline (from its public URL), else None."""
+    if not image_url or f"/{UPLOAD_PREFIX}/" not in image_url:
+        return None
+    return f"{UPLOAD_PREFIX}/{image_url.split(f'/{UPLOAD_PREFIX}/', 1)[1]}"
+
+
+def decoded_format(data: bytes) -> str:
+    """Decode an upload with Pillow; returns its format, or raises 422 if it is not an accepted image."""
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image_format = image.format
+            if image_format in UPLOAD_FORMATS:
+                # JPEGs decode at reduced scale (enough for the largest variant) to keep this cheap
+                image.draft("RGB", (max(IMAGE_VARIANTS.values()),) * 2)
+                image.load()
+    except Exception:
+        raise HTTPException(status_code=422, detail="Uploaded file is not a readable image")
+    if image_format not in UPLOAD_FORMATS:
+        raise HTTPException(status_code=422, detail=f"Unsupported image format, use one of: {', '.join(UPLOAD_FORMATS)}")
+    return image_format
+
+
+def render_variant(data: bytes, max_edge: int) -> bytes:
+    """Downscale an image so its longest edge is at most `max_edge` and encode it as WebP."""
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        image.thumbnail((max_edge, max_edge))
+        out = BytesIO()
+        image.save(out, format="WEBP", quality=WEBP_QUALITY)
+        return out.getvalue()
+
+
+class UploadResult(NamedTuple):
+    image_url: str
+    saved: bool  # False when the original could not be stored
+    thumbnail_url: Optional[str]  # Set once the thumbnail variant is stored
+
+
+class ImageUploader:
+    """
+    Hands uploads to a bounded pool of background threads.
+    `submit` checks the image and returns the public URL of the original right away; the original
+    and its WebP variants are written by the worker, which then reports an UploadResult to
+    `on_finished` (and keeps it for `finished` lookups for a few minutes).
+    """
+
+    def __init__(self, backend, workers: int = 2, max_pending: int = 32,
+                 on_finished: Optional[Callable[[UploadResult], None]] = None):
+        self.backend = backend
+        self.on_finished = on_finished
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-upload")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._finished = TTLCache(maxsize=1024, ttl=600)
+
+    def submit(self, data: bytes, filename: str, content_type: Optional[str]) -> str:
+        # Rejected before queuing, so a stored URL always points at an image Pillow can render
+        image_format = decoded_format(data)
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(status_code=503, detail="Image upload queue is full, please retry")
+
+        path = f"{UPLOAD_PREFIX}/{uuid.uuid4()}.{UPLOAD_FORMATS[image_format]}"
+        future = self._executor.submit(self._process, path, data, Image.MIME[image_format])
+        future.add_done_callback(lambda _: self._slots.release())
+        return self.backend.public_url(path)
+
+    def finished(self, image_url: str) -> Optional[UploadResult]:
+        return self._finished.get(image_url)
+
+    def _process(self, path: str, data: bytes, content_type: str):
+        result = UploadResult(self.backend.public_url(path), saved=False, thumbnail_url=None)
+        try:
+            self.backend.save(path, data, content_type)
+            result = result._replace(saved=True)
+        except Exception as e:
+            logger.error(f"Failed to upload image {path}: {str(e)}")
+
+        for variant, max_edge in IMAGE_VARIANTS.items() if result.saved else ():
+            try:
+                self.backend.save(variant_path(path, variant), render_variant(data, max_edge), "image/webp")
+                if variant == "thumb":
+                    result = result._replace(thumbnail_url=self.backend.public_url(variant_path(path, variant)))
+            except Exception as e:
+                logger.error(f"Failed to write {variant} variant of {path}: {str(e)}")
+
+        # Recorded before notifying, so a meal saved meanwhile finds it (see endpoints.update_meal_route)
+        self._finished.set(result.image_url, result)
+        if self.on_finished is not None:
+            try:
+                self.on_finished(result)
+            except Exception as e:
+                logger.error(f"Failed to record upload of {path}: {str(e)}")
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+def _default_backend():
+    if IMAGE_STORAGE_BACKEND == "local":
+        return LocalStorageBackend(LOCAL_STORAGE_DIR, LOCAL_STORAGE_URL)
+    return FirebaseStorageBackend()
+
+
+image_uploader = ImageUploader(
+    _default_backend(),
+    workers=int(os.getenv("IMAGE_UPLOAD_WORKERS", "2")),
+    max_pending=int(os.getenv("IMAGE_UPLOAD_QUEUE_SIZE", "32")),
+)
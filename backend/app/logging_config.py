@@ -0,0 +1,166 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.metrics import Counter
+
+# Logging setup: request threads only enqueue records; a background listener formats
+# them as JSON and writes them to stderr
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Per-logger sampling and rate caps for records below WARNING, e.g.
+#   LOG_SAMPLE_RATES=app.access=0.1,app.routes.payments=0.5
+#   LOG_RATE_LIMITS=app.routes.payments=50   (records per second)
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "")
+
+# Correlation id of the request being handled (set by RequestIdMiddleware)
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+LOG_RECORDS_DROPPED = Counter("log_records_dropped", "Log records dropped by sampling, rate caps or a full queue", ("reason",))
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def _parse_logger_map(raw: str) -> Dict[str, float]:
+    values = {}
+    for item in raw.split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            values[name.strip()] = float(value)
+    return values
+
+
+def _lookup(values: Dict[str, float], logger_name: str) -> Optional[float]:
+    """Most specific setting for a logger, walking up its dotted parents."""
+    name = logger_name
+    while name:
+        if name in values:
+            return values[name]
+        name = name.rpartition(".")[0]
+    return None
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request id (runs on the producing thread)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Samples and rate-caps records below WARNING per logger; warnings and errors always pass."""
+
+    def __init__(self, sample_rates: Dict[str, float], rate_limits: Dict[str, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limits = rate_limits
+        self._windows: Dict[str, list] = {}  # logger -> [window start, count]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = _lookup(self.sample_rates, record.name)
+        if rate is not None and random.random() >= rate:
+            LOG_RECORDS_DROPPED.inc(reason="sampled")
+            return False
+
+        limit = _lookup(self.rate_limits, record.name)
+        if limit is not None:
+            now = time.monotonic()
+            with self._lock:
+                window = self._windows.setdefault(record.name, [now, 0])
+                if now - window[0] >= 1.0:
+                    window[0], window[1] = now, 0
+                window[1] += 1
+                if window[1] > limit:
+                    LOG_RECORDS_DROPPED.inc(reason="rate_limited")
+                    return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including the request id and any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render the traceback now (the listener may run after they change),
+        # but leave formatting of the record itself to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging():
+    """Route all logging through a bounded queue drained by a background listener thread."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s"))
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter(_parse_logger_map(LOG_SAMPLE_RATES), _parse_logger_map(LOG_RATE_LIMITS)))
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
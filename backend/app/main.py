@@ -1,11 +1,20 @@
-from fastapi import FastAPI, Request
-from app.database import engine, Base
-from app import endpoints
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from app.database import engine, Base, READ_YOUR_WRITES_SECONDS
+from app import endpoints, metrics
 from app.routes import payments
-from starlette.middleware.base import BaseHTTPMiddleware
+from app.crud import record_image_upload
+from app.images import IMAGE_STORAGE_BACKEND, LOCAL_STORAGE_DIR, image_uploader
+from app.middleware import LAST_WRITE_HEADER, MetricsMiddleware, ReadYourWritesMiddleware, RequestIdMiddleware
+from app.profiling import QueryProfilerMiddleware
+from app.logging_config import setup_logging
+from app.order_feed import start_order_feed
+from app.pagination import NEXT_CURSOR_HEADER
+from app.reservations import RESERVATION_RELEASE_INTERVAL_SECONDS, release_expired_reservations_forever
+from app.webhooks import WEBHOOK_WORKERS, start_webhook_workers, stop_webhook_workers
 from fastapi.middleware.cors import CORSMiddleware
-import logging
-import time
+from fastapi.staticfiles import StaticFiles
 import os
 from dotenv import load_dotenv
 
@@ -15,19 +24,32 @@ load_dotenv()
 # Initialize database tables
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Return stock from checkout holds whose session expired unpaid
+    sweeper = asyncio.create_task(release_expired_reservations_forever()) if RESERVATION_RELEASE_INTERVAL_SECONDS > 0 else None
+    # Process stored Stripe webhook events in the background
+    webhook_workers = start_webhook_workers() if WEBHOOK_WORKERS > 0 else []
+    # Relay chef order notifications from other workers to this one's live streams (Postgres only)
+    order_listener = start_order_feed()
+    yield
+    if sweeper:
+        sweeper.cancel()
+    if order_listener:
+        order_listener.cancel()
+    stop_webhook_workers(webhook_workers)
+
 app = FastAPI(
     title="CampusEats API",
     description="A peer-to-peer food marketplace platform for campus communities",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO, 
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# Set up logging (JSON records written by a background thread)
+setup_logging()
 
 # CORS Configuration
 # Get allowed origins from environment variable, default to localhost for development
@@ -49,38 +71,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    # "*" is not honoured on credentialed requests, so name the paging and write-time headers explicitly
+    expose_headers=["*", NEXT_CURSOR_HEADER, LAST_WRITE_HEADER],
 )
 
-# Middleware to log requests & responses
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Log request
-        logging.info(f"Incoming request: {request.method} {request.url}")
-        
-        try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            # Log response
-            logging.info(
-                f"{request.method} {request.url.path} - "
-                f"Status: {response.status_code} - "
-                f"Duration: {process_time:.3f}s"
-            )
-            
-            return response
-        except Exception as e:
-            logging.error(f"Request failed: {request.method} {request.url.path} - Error: {str(e)}")
-            raise
-
-app.add_middleware(LoggingMiddleware)
+# Hand clients their last write time so their next reads go to the primary (read-your-writes)
+app.add_middleware(ReadYourWritesMiddleware, max_age=READ_YOUR_WRITES_SECONDS)
+
+# Per-route request metrics (served at /metrics) and sampled access logs
+app.add_middleware(MetricsMiddleware)
+
+# SQL query counts/time per route, slow-query and N+1 warnings, optional Server-Timing header
+app.add_middleware(QueryProfilerMiddleware)
+
+# Request id correlation for logs (X-Request-ID in and out)
+app.add_middleware(RequestIdMiddleware)
 
 # Include API routes
 app.include_router(endpoints.router)
 app.include_router(payments.router)
+app.include_router(metrics.router)
+
+# Record thumbnails (or failed uploads) on meals once background image uploads finish
+image_uploader.on_finished = record_image_upload
+
+# Serve uploaded images when using the local storage backend
+if IMAGE_STORAGE_BACKEND == "local":
+    os.makedirs(LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount("/media", StaticFiles(directory=LOCAL_STORAGE_DIR), name="media")
 
 @app.get("/")
 def read_root():
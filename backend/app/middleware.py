@@ -0,0 +1,148 @@
+import logging
+import os
+import random
+import time
+import uuid
+
+from app.logging_config import request_id_var
+from app.metrics import Counter, Gauge, Histogram
+
+# Fraction of requests written to the access log (0 disables it; failures are always logged)
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0"))
+
+access_logger = logging.getLogger("app.access")
+
+# Client-visible time of the client's last successful write (see ReadYourWritesMiddleware)
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served", ("method",))
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route"),
+)
+REQUESTS_TOTAL = Counter("http_requests", "Completed requests by route template and status", ("method", "route", "status"))
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size by route template", ("method", "route"), buckets=SIZE_BUCKETS,
+)
+
+
+def route_label(scope) -> str:
+    """Route template (e.g. /meals/{meal_id}) so label cardinality stays bounded."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    return getattr(route, "path_format", None) or getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency, in-flight count, status codes and response
+    sizes per route, with optional sampled access logging.
+    """
+
+    def __init__(self, app, sample_rate: float = ACCESS_LOG_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method=method)
+        failed = False
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            REQUESTS_IN_FLIGHT.dec(method=method)
+            duration = time.perf_counter() - start
+            route = route_label(scope)
+            REQUEST_DURATION.observe(duration, method=method, route=route)
+            REQUESTS_TOTAL.inc(method=method, route=route, status=status)
+            RESPONSE_SIZE.observe(size, method=method, route=route)
+
+            if failed or status >= 500:
+                access_logger.error(f"{method} {scope['path']} - Status: {status} - Duration: {duration:.3f}s")
+            elif self.sample_rate > 0 and random.random() < self.sample_rate:
+                access_logger.info(f"{method} {scope['path']} - Status: {status} - Duration: {duration:.3f}s - Size: {size}")
+
+
+class RequestIdMiddleware:
+    """
+    Pure ASGI middleware that takes the caller's X-Request-ID (or generates one), makes it
+    available to log records and echoes it back on the response.
+    """
+
+    header = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(self.header, b"").decode("latin-1")
+        # Accept short caller-supplied ids only, so ids stay safe to log and index
+        request_id = incoming if 0 < len(incoming) <= 64 and incoming.isprintable() else uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware that stamps successful writes (POST/PUT/PATCH/DELETE below 400) with their
+    time, as a cookie and an X-Last-Write header living `max_age` seconds. Reads that send either
+    back in time are served by the primary (see database.get_read_db), whichever worker handles them.
+    """
+
+    methods = {"POST", "PUT", "PATCH", "DELETE"}
+
+    def __init__(self, app, max_age: float):
+        self.app = app
+        self.max_age = max(int(max_age), 1)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                written_at = f"{time.time():.3f}"
+                cookie = f"{LAST_WRITE_COOKIE}={written_at}; Max-Age={self.max_age}; Path=/; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode("latin-1")),
+                    (LAST_WRITE_HEADER.lower().encode("latin-1"), written_at.encode("latin-1")),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
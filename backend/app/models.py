@@ -1,8 +1,10 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Boolean, func, Index, Table
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Boolean, func, Index, Table, event, DDL, delete, insert, inspect
 from sqlalchemy.dialects.postgresql import JSONB, JSON
 from datetime import datetime
 from app.database import Base
+from app.geo import grid_cell
+from app.timeslots import slot_ranges
 from uuid import uuid4
 
 # Association table for many-to-many relationship between orders and meals
@@ -10,7 +12,8 @@ order_meal_association = Table(
     "order_meal_association",
     Base.metadata,
     Column("order_id", String, ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True),
-    Column("meal_id", Integer, ForeignKey("meals.id", ondelete="CASCADE"), primary_key=True)
+    Column("meal_id", Integer, ForeignKey("meals.id", ondelete="CASCADE"), primary_key=True),
+    Column("quantity", Integer, nullable=False, default=1, server_default="1"),
 )
 
 
@@ -29,7 +32,9 @@ class User(Base):
     role = Column(String, default="buyer")  # buyer, seller, admin
     phone_number = Column(String, nullable=True)
     address = Column(String, nullable=True)
-    rating = Column(String, nullable=True)
+    rating = Column(String, nullable=True)  # Display string, e.g. "4.3 (387)", derived from the aggregate below
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")  # Sum of received review ratings
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     is_verified = Column(Boolean, default=False)
@@ -57,13 +62,17 @@ class Meal(Base):
     description = Column(String, nullable=True)
     ingredients = Column(String, nullable=False)
     price = Column(Float, nullable=False)
-    quantity = Column(Integer, nullable=True)
+    quantity = Column(Integer, nullable=True)  # Stock left, decremented by checkout holds (ignored when unlimited)
     image_url = Column(String, nullable=True)
+    thumbnail_url = Column(String, nullable=True)  # Set once the upload pipeline has stored the WebP thumbnail
     seller_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
-    timeslots = Column(JSONB, nullable=False)
+    geo_cell = Column(Integer, nullable=True)  # Grid cell of (latitude, longitude), see app/geo.py
+    timeslots = Column(JSONB, nullable=False)  # Mirrored into meal_timeslots for availability filtering
     unlimited = Column(Boolean, nullable=False, default=False)
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")  # Sum of review ratings
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -75,10 +84,69 @@ class Meal(Base):
     # Indexes for performance
     __table_args__ = (
         Index('idx_meal_location', 'latitude', 'longitude'),
+        Index('idx_meal_geo_cell', 'geo_cell', 'latitude', 'longitude'),
         Index('idx_meal_seller', 'seller_id'),
+        # Trigram indexes for /meals/search (Postgres only; requires the pg_trgm extension)
+        *(
+            Index(f'idx_meal_{column}_trgm', column, postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+            for column in ('name', 'description', 'ingredients')
+        ),
     )
 
 
+# The trigram indexes above need pg_trgm (db/init.sql also enables it)
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
+# Keep the grid cell in sync with the coordinates on every insert/update
+@event.listens_for(Meal, "before_insert")
+@event.listens_for(Meal, "before_update")
+def _set_meal_geo_cell(mapper, connection, target):
+    if target.latitude is not None and target.longitude is not None:
+        target.geo_cell = grid_cell(target.latitude, target.longitude)
+
+
+class MealTimeslot(Base):
+    """A meal's pickup slot as a minute-of-day range [start_minute, end_minute), derived from Meal.timeslots"""
+    __tablename__ = "meal_timeslots"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    meal_id = Column(Integer, ForeignKey("meals.id", ondelete="CASCADE"), nullable=False)
+    start_minute = Column(Integer, nullable=False)
+    end_minute = Column(Integer, nullable=False)
+
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_meal_timeslot_meal', 'meal_id', 'start_minute', 'end_minute'),
+        # Range index for "available at" lookups (Postgres only; crud filters with the same expression)
+        Index('idx_meal_timeslot_range', func.int4range(start_minute, end_minute), postgresql_using='gist').ddl_if(dialect='postgresql'),
+    )
+
+
+def _insert_slot_rows(connection, meal_id, timeslots):
+    rows = [{"meal_id": meal_id, "start_minute": start, "end_minute": end} for start, end in slot_ranges(timeslots)]
+    if rows:
+        connection.execute(insert(MealTimeslot.__table__), rows)
+
+
+# Keep meal_timeslots in sync with Meal.timeslots (bulk loads bypass this; see app/backfill_timeslots.py)
+@event.listens_for(Meal, "after_insert")
+def _add_meal_timeslots(mapper, connection, target):
+    _insert_slot_rows(connection, target.id, target.timeslots)
+
+
+@event.listens_for(Meal, "after_update")
+def _replace_meal_timeslots(mapper, connection, target):
+    if not inspect(target).attrs.timeslots.history.has_changes():
+        return
+    connection.execute(delete(MealTimeslot.__table__).where(MealTimeslot.meal_id == target.id))
+    _insert_slot_rows(connection, target.id, target.timeslots)
+
+
 class Order(Base):
     """Order model for purchase transactions"""
     __tablename__ = "orders"
@@ -111,6 +179,7 @@ class ChefOrder(Base):
     buyer_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     meal_id = Column(Integer, ForeignKey("meals.id", ondelete="CASCADE"), nullable=False, index=True)
     chef_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False, default=1, server_default="1")
     status = Column(String, default="pending")  # pending, completed, canceled
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -124,6 +193,45 @@ class ChefOrder(Base):
         Index('idx_chef_order_chef', 'chef_id'),
         Index('idx_chef_order_buyer', 'buyer_id'),
         Index('idx_chef_order_status', 'status'),
+        Index('idx_chef_order_chef_updated', 'chef_id', 'updated_at'),  # Live order feed reads
+    )
+
+
+class Reservation(Base):
+    """Stock held for a checkout session until it is paid (committed) or expires (released), see app/reservations.py"""
+    __tablename__ = "reservations"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    order_id = Column(String, nullable=False, index=True)  # Generated at checkout; the Order row only exists once paid
+    meal_id = Column(Integer, ForeignKey("meals.id", ondelete="CASCADE"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="held")  # held, committed, released, oversold
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_reservation_status_expiry', 'status', 'expires_at'),
+    )
+
+
+class StripeEvent(Base):
+    """A received Stripe webhook event, processed in the background by app/webhooks.py"""
+    __tablename__ = "stripe_events"
+
+    id = Column(String, primary_key=True)  # Stripe event id; redelivered events hit the primary key
+    type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # Raw, signature-verified request body
+    status = Column(String, nullable=False, default="pending")  # pending, processing, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Retry time, or lease expiry while processing
+    last_error = Column(Text, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_stripe_event_status_next_attempt', 'status', 'next_attempt_at'),
     )
 
 
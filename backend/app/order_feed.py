@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, event, func, or_, select
+from sqlalchemy.orm import Session
+from app.database import AsyncSessionLocal, async_engine
+from app.metrics import Counter, Gauge
+from app.models import ChefOrder
+from app.pagination import encode_cursor
+from app.profiling import detach_request_profiling
+from app.schemas import ChefOrderResponse
+
+# Live chef order feed (GET /api/orders/{user_id}/stream, Server-Sent Events). Writes to chef orders
+# publish the affected chef IDs when their transaction commits; every stream connected for one of
+# those chefs wakes up and sends the orders changed since its last event. On Postgres the chef IDs
+# travel over LISTEN/NOTIFY, so a write handled by any worker reaches streams on every worker;
+# elsewhere they are delivered within the process.
+#
+# Delivery is at least once: after a reconnect (or for orders committed out of timestamp order) an
+# order can be sent again, so clients merge events by order `id`.
+
+ORDER_FEED_CHANNEL = "chef_orders"
+
+# Comment line sent on idle streams so proxies keep them open
+ORDER_FEED_HEARTBEAT_SECONDS = float(os.getenv("ORDER_FEED_HEARTBEAT_SECONDS", "15"))
+
+# Streams re-read this far behind their newest event, to catch orders whose transaction committed
+# after a later-stamped one (and clock skew between workers)
+ORDER_FEED_LOOKBACK_SECONDS = float(os.getenv("ORDER_FEED_LOOKBACK_SECONDS", "30"))
+
+RECONNECT_DELAY_MS = 3000  # Sent as the SSE `retry` field
+READ_BATCH_SIZE = 200
+MAX_NOTIFY_PAYLOAD = 7900  # Postgres caps NOTIFY payloads just below 8000 bytes
+LISTENER_KEEPALIVE_SECONDS = 30
+
+EVENTS_SENT = Counter("order_feed_events_sent", "Chef order events sent on live streams")
+NOTIFICATIONS = Counter("order_feed_notifications", "Chef order change notifications by source", ("source",))
+
+logger = logging.getLogger(__name__)
+
+
+class OrderFeed:
+    """
+    In-process pub/sub: chef ID -> one wake-up event per connected stream. Notifications carry no
+    order data, so a burst of changes coalesces into one read per stream.
+    """
+
+    def __init__(self):
+        self._streams: Dict[str, Set[asyncio.Event]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self):
+        return sum(len(streams) for streams in self._streams.values())
+
+    def subscribe(self, chef_id: str) -> asyncio.Event:
+        self._loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        self._streams[chef_id].add(wake)
+        return wake
+
+    def unsubscribe(self, chef_id: str, wake: asyncio.Event):
+        streams = self._streams.get(chef_id)
+        if streams is not None:
+            streams.discard(wake)
+            if not streams:
+                del self._streams[chef_id]
+
+    def _wake(self, chef_ids: Optional[Iterable[str]]):
+        chef_ids = self._streams.keys() if chef_ids is None else chef_ids
+        for chef_id in list(chef_ids):
+            for wake in self._streams.get(chef_id, ()):
+                wake.set()
+
+    def publish(self, chef_ids: Iterable[str]):
+        """Wake this worker's streams for the chefs; safe to call from any thread."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake, list(chef_ids))
+
+    def wake_all(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake, None)
+
+
+order_feed = OrderFeed()
+
+Gauge("order_feed_streams", "Chef order streams connected to this worker", collect=lambda: [({}, len(order_feed))])
+
+
+def _notify_payloads(chef_ids: Iterable[str]) -> List[str]:
+    payloads, current = [], []
+    for chef_id in sorted(set(chef_ids)):
+        if current and len(",".join(current + [chef_id])) > MAX_NOTIFY_PAYLOAD:
+            payloads.append(",".join(current))
+            current = []
+        current.append(chef_id)
+    if current:
+        payloads.append(",".join(current))
+    return payloads
+
+
+def publish_chef_orders(session: Session, chef_ids: Iterable[str]):
+    """
+    Announce changed chef orders once the session's transaction commits (nothing is sent if it rolls
+    back). Needed after Core inserts/updates; ORM flushes of ChefOrder announce themselves.
+    From an AsyncSession: `await db.run_sync(publish_chef_orders, chef_ids)`.
+    """
+    chef_ids = {chef_id for chef_id in chef_ids if chef_id}
+    if not chef_ids:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        # NOTIFY is transactional: Postgres delivers it to every listener on commit
+        connection = session.connection()
+        for payload in _notify_payloads(chef_ids):
+            connection.execute(select(func.pg_notify(ORDER_FEED_CHANNEL, payload)))
+    else:
+        session.info.setdefault("order_feed_chef_ids", set()).update(chef_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _publish_flushed_chef_orders(session, flush_context):
+    chef_ids = [order.chef_id for order in session.new if isinstance(order, ChefOrder)]
+    chef_ids += [order.chef_id for order in session.dirty if isinstance(order, ChefOrder) and session.is_modified(order)]
+    if chef_ids:
+        publish_chef_orders(session, chef_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_committed_chef_orders(session):
+    chef_ids = session.info.pop("order_feed_chef_ids", None)
+    if chef_ids:
+        NOTIFICATIONS.inc(source="local")
+        order_feed.publish(chef_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back_chef_orders(session):
+    session.info.pop("order_feed_chef_ids", None)
+
+
+async def listen_for_chef_orders():
+    """Forward NOTIFYs on ORDER_FEED_CHANNEL to this worker's streams (Postgres); runs until cancelled."""
+    import asyncpg
+
+    dsn = async_engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+    def on_notify(connection, pid, channel, payload):
+        NOTIFICATIONS.inc(source="postgres")
+        order_feed.publish(payload.split(","))
+
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(ORDER_FEED_CHANNEL, on_notify)
+            # Notifications sent while this worker was not listening are lost: let every stream re-read
+            order_feed.wake_all()
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), LISTENER_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    await connection.fetchval("SELECT 1")  # Notices a dropped connection
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Chef order listener failed, reconnecting")
+        finally:
+            if connection is not None and not connection.is_closed():
+                connection.terminate()
+        await asyncio.sleep(RECONNECT_DELAY_MS / 1000)
+
+
+def start_order_feed() -> Optional[asyncio.Task]:
+    """Start the LISTEN task when the database is Postgres (see main.py); cancel it to stop."""
+    if async_engine.dialect.name != "postgresql":
+        return None
+    return asyncio.create_task(listen_for_chef_orders())
+
+
+async def _changes_since(chef_id: str, high_water: datetime, sent: Dict[int, datetime]) -> Tuple[List[ChefOrder], datetime]:
+    """
+    The chef's orders changed since `high_water` (minus the lookback) that this stream has not sent
+    in their current version, oldest first, and the new high-water mark.
+    """
+    since = high_water - timedelta(seconds=ORDER_FEED_LOOKBACK_SECONDS)
+    changed, after = [], None
+    async with AsyncSessionLocal() as db:
+        while True:
+            query = select(ChefOrder).where(ChefOrder.chef_id == chef_id, ChefOrder.updated_at > since)
+            if after:
+                query = query.where(or_(
+                    ChefOrder.updated_at > after[0],
+                    and_(ChefOrder.updated_at == after[0], ChefOrder.id > after[1]),
+                ))
+            rows = (await db.execute(query.order_by(ChefOrder.updated_at, ChefOrder.id).limit(READ_BATCH_SIZE))).scalars().all()
+            for order in rows:
+                if sent.get(order.id) != order.updated_at:
+                    sent[order.id] = order.updated_at
+                    changed.append(order)
+            if len(rows) < READ_BATCH_SIZE:
+                break
+            after = (rows[-1].updated_at, rows[-1].id)
+
+    if changed:
+        high_water = max(high_water, changed[-1].updated_at)
+    horizon = high_water - timedelta(seconds=ORDER_FEED_LOOKBACK_SECONDS)
+    for order_id in [order_id for order_id, updated_at in sent.items() if updated_at <= horizon]:
+        del sent[order_id]
+    return changed, high_water
+
+
+def _format_event(order: ChefOrder) -> str:
+    data = ChefOrderResponse.model_validate(order).model_dump_json()
+    return f"id: {encode_cursor(order.updated_at, order.id)}\nevent: chef_order\ndata: {data}\n\n"
+
+
+async def chef_order_events(chef_id: str, after: Optional[Tuple[datetime, int]] = None) -> AsyncIterator[str]:
+    """
+    SSE stream of the chef's new and updated orders, starting after the (updated_at, id) of the last
+    event the client received, or from now (the first change then also sends orders changed within
+    the lookback window). An idle stream holds no database connection.
+    """
+    detach_request_profiling()  # Re-running the same read is the point of a stream, not an N+1
+    wake = order_feed.subscribe(chef_id)
+    high_water = after[0] if after else datetime.utcnow()
+    sent: Dict[int, datetime] = {}
+    # A resumed stream catches up first; a fresh one (the client just loaded the list) waits for a change
+    changes_pending = after is not None
+    try:
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+        while True:
+            if changes_pending:
+                wake.clear()
+                changed, high_water = await _changes_since(chef_id, high_water, sent)
+                if changed:
+                    EVENTS_SENT.inc(len(changed))
+                    yield "".join(_format_event(order) for order in changed)
+            try:
+                await asyncio.wait_for(wake.wait(), ORDER_FEED_HEARTBEAT_SECONDS)
+                changes_pending = True
+            except asyncio.TimeoutError:
+                changes_pending = False
+                yield ": keep-alive\n\n"
+    finally:
+        order_feed.unsubscribe(chef_id, wake)
@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+# Response header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Packs the sort key of the last returned row into an opaque, URL-safe token."""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str], size: int) -> Optional[List[Any]]:
+    """Unpacks a token produced by `encode_cursor` (raises 400 if it is malformed)."""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def decode_distance_cursor(token: Optional[str]) -> Optional[Tuple[float, int]]:
+    """Cursor for distance-ordered listings: (exact distance, meal id)."""
+    values = decode_cursor(token, 2)
+    if values is None:
+        return None
+    try:
+        return float(values[0]), int(values[1])
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def decode_created_at_cursor(token: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Cursor for newest-first listings: (created_at, row id)."""
+    values = decode_cursor(token, 2)
+    if values is None:
+        return None
+    try:
+        return datetime.fromisoformat(values[0]), int(values[1])
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
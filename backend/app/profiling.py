@@ -0,0 +1,144 @@
+import contextvars
+import logging
+import os
+import time
+from collections import Counter as TallyCounter
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.metrics import Counter, Histogram
+from app.middleware import route_label
+
+# SQL profiling: per-route query counts and time, a slow-query log and N+1 detection
+
+SQL_PROFILING = os.getenv("SQL_PROFILING", "1") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Identical statements executed this many times in one request are flagged as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+# Adds `Server-Timing: db;dur=...` to responses (visible in browser devtools)
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT = Counter("db_queries", "SQL statements executed, by route template", ("route",))
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement latency by route template", ("route",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements issued per request", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+N_PLUS_ONE_SUSPECTED = Counter("db_n_plus_one_suspected", "Requests that repeated one statement template", ("route",))
+
+
+class RequestQueries:
+    """Queries issued while handling one request."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.duration = 0.0
+        self.templates = TallyCounter()
+
+    @property
+    def route(self) -> str:
+        return route_label(self.scope)
+
+
+_current: contextvars.ContextVar[Optional[RequestQueries]] = contextvars.ContextVar("request_queries", default=None)
+
+
+def parameter_shape(parameters):
+    """Types (not values) of the bound parameters, safe to log."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info.pop("query_started_at", None)
+    if started_at is None:
+        return
+    elapsed = time.perf_counter() - started_at
+
+    queries = _current.get()
+    route = queries.route if queries is not None else "none"
+    QUERY_COUNT.inc(route=route)
+    QUERY_DURATION.observe(elapsed, route=route)
+    if queries is not None:
+        queries.count += 1
+        queries.duration += elapsed
+        queries.templates[statement] += 1
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms) on {route}: {' '.join(statement.split())}",
+            extra={"route": route, "duration_ms": round(elapsed * 1000, 1),
+                   "params": parameter_shape(parameters), "executemany": executemany},
+        )
+
+
+def instrument_engine(engine):
+    """Attach the profiling hooks to a (sync) engine; pass `async_engine.sync_engine` for async ones."""
+    if not SQL_PROFILING:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def detach_request_profiling():
+    """
+    Stop attributing queries in the current context to the request, for long-lived responses
+    (streams) whose repeated reads are not an N+1. They still count under route "none".
+    """
+    _current.set(None)
+
+
+def _report(queries: RequestQueries):
+    route = queries.route
+    QUERIES_PER_REQUEST.observe(queries.count, route=route)
+    for statement, count in queries.templates.items():
+        if count >= N_PLUS_ONE_THRESHOLD:
+            N_PLUS_ONE_SUSPECTED.inc(route=route)
+            logger.warning(
+                f"Possible N+1 on {route}: statement executed {count} times: {' '.join(statement.split())}",
+                extra={"route": route, "repeat_count": count},
+            )
+
+
+class QueryProfilerMiddleware:
+    """Pure ASGI middleware collecting the queries of each request (and the Server-Timing header)."""
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING_HEADER):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SQL_PROFILING:
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(scope)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                value = f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode("latin-1"))]
+            await send(message)
+
+        token = _current.set(queries)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            _report(queries)
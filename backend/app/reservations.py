@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, case, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
+from app.metrics import Counter
+from app.models import Meal, Reservation
+
+# Inventory reservations: creating a checkout session holds the ordered quantities (decrementing
+# Meal.quantity), the checkout.session.completed webhook commits the hold, and holds whose session
+# expired are released back to stock. Meals marked `unlimited` are never decremented.
+#
+# Run from the backend directory to release expired holds once (e.g. from cron):
+#   python -m app.reservations
+
+# Stripe checkout sessions must expire 30 minutes to 24 hours after Stripe creates them. Their
+# lifetime is counted from the Stripe call and kept a margin inside those bounds (latency, clock skew)
+STRIPE_EXPIRY_MARGIN_SECONDS = 60
+CHECKOUT_SESSION_TTL_SECONDS = min(
+    max(int(os.getenv("RESERVATION_TTL_SECONDS", "1800")), 1800 + STRIPE_EXPIRY_MARGIN_SECONDS),
+    86400 - STRIPE_EXPIRY_MARGIN_SECONDS,
+)
+
+# Holds outlive their session by this much, covering the work between taking the hold and creating
+# the session, so a buyer can never pay for stock that was released
+RESERVATION_HOLD_MARGIN_SECONDS = 300
+RESERVATION_TTL_SECONDS = CHECKOUT_SESSION_TTL_SECONDS + RESERVATION_HOLD_MARGIN_SECONDS
+
+# How often each worker releases expired holds in the background (0 disables, e.g. when using cron)
+RESERVATION_RELEASE_INTERVAL_SECONDS = float(os.getenv("RESERVATION_RELEASE_INTERVAL_SECONDS", "60"))
+
+# Holds released per statement, to keep each release transaction short
+RELEASE_BATCH_SIZE = 5000
+
+RESERVATIONS = Counter("inventory_reservations", "Reservation outcomes per meal", ("outcome",))
+
+logger = logging.getLogger(__name__)
+
+
+def order_quantities(meals_data: list) -> Dict[int, int]:
+    """Total quantity per meal ID from order meal entries (`{"id", "quantity"}`, quantity defaulting to 1)."""
+    quantities = defaultdict(int)
+    for item in meals_data:
+        try:
+            meal_id = int(item["id"])
+            quantity = int(item["quantity"]) if item.get("quantity") is not None else 1
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Invalid meal entry in order: {item}")
+        if quantity < 1:
+            raise HTTPException(status_code=400, detail=f"Invalid quantity for meal {meal_id}: {quantity}")
+        quantities[meal_id] += quantity
+    return dict(quantities)
+
+
+def checkout_session_expires_at() -> int:
+    """Stripe `expires_at` (epoch seconds) for a checkout session created now; take the hold first."""
+    return int(time.time()) + CHECKOUT_SESSION_TTL_SECONDS
+
+
+def _untracked():
+    # Meals whose stock is not counted (unlimited, or rows that predate quantities)
+    return or_(Meal.unlimited.is_(True), Meal.quantity.is_(None))
+
+
+def _take_stock(meal_id: int, quantity: int):
+    # One conditional statement: concurrent buyers queue on the meal's row lock and the WHERE clause
+    # is re-checked against the committed quantity, so stock can never go negative
+    return (
+        update(Meal)
+        .where(Meal.id == meal_id, or_(_untracked(), Meal.quantity >= quantity))
+        .values(quantity=case((_untracked(), Meal.quantity), else_=Meal.quantity - quantity))
+        .returning(Meal.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def hold_stock(db: AsyncSession, order_id: str, quantities: Dict[int, int]) -> datetime:
+    """
+    Atomically hold every ordered quantity for `order_id`, or nothing.
+    Raises 404 for an unknown meal and 409 when a meal does not have enough stock left.
+    Returns when the hold expires (an empty order holds nothing).
+    """
+    expires_at = datetime.utcnow() + timedelta(seconds=RESERVATION_TTL_SECONDS)
+    if not quantities:
+        return expires_at
+    # Always lock meals in ID order so concurrent multi-meal checkouts cannot deadlock
+    for meal_id in sorted(quantities):
+        if (await db.execute(_take_stock(meal_id, quantities[meal_id]))).first() is None:
+            await db.rollback()
+            RESERVATIONS.inc(outcome="rejected")
+            if await db.get(Meal, meal_id) is None:
+                raise HTTPException(status_code=404, detail=f"Meal {meal_id} not found")
+            raise HTTPException(status_code=409, detail=f"Not enough stock left for meal {meal_id}")
+
+    await db.execute(insert(Reservation), [
+        {"order_id": order_id, "meal_id": meal_id, "quantity": quantity, "status": "held", "expires_at": expires_at}
+        for meal_id, quantity in sorted(quantities.items())
+    ])
+    await db.commit()
+    RESERVATIONS.inc(len(quantities), outcome="held")
+    return expires_at
+
+
+async def commit_reservations(db: AsyncSession, order_id: str, quantities: Dict[int, int]) -> List[int]:
+    """
+    Mark the order's holds as sold, in the caller's transaction. Meals without a live hold (it expired
+    before payment, or the session predates reservations) have their stock taken now; returns the IDs
+    of meals that no longer had enough stock, which were oversold.
+    """
+    committed = await db.execute(
+        update(Reservation)
+        .where(Reservation.order_id == order_id, Reservation.status == "held")
+        .values(status="committed")
+        .returning(Reservation.meal_id)
+        .execution_options(synchronize_session=False)
+    )
+    RESERVATIONS.inc(len(committed.all()), outcome="committed")
+
+    # A retried webhook finds its holds already committed and takes nothing twice
+    settled = set((await db.execute(
+        select(Reservation.meal_id).where(Reservation.order_id == order_id, Reservation.status.in_(("committed", "oversold")))
+    )).scalars())
+
+    late, oversold = [], []
+    for meal_id in sorted(set(quantities) - settled):
+        taken = (await db.execute(_take_stock(meal_id, quantities[meal_id]))).first() is not None
+        (late if taken else oversold).append(meal_id)
+        late_row = {"order_id": order_id, "meal_id": meal_id, "quantity": quantities[meal_id],
+                    "status": "committed" if taken else "oversold", "expires_at": datetime.utcnow()}
+        await db.execute(insert(Reservation), [late_row])
+
+    if late:
+        RESERVATIONS.inc(len(late), outcome="committed")
+    if oversold:
+        RESERVATIONS.inc(len(oversold), outcome="oversold")
+    return oversold
+
+
+async def _release(db: AsyncSession, *conditions) -> int:
+    released = (await db.execute(
+        update(Reservation)
+        .where(Reservation.status == "held", *conditions)
+        .values(status="released")
+        .returning(Reservation.meal_id, Reservation.quantity)
+        .execution_options(synchronize_session=False)
+    )).all()
+
+    restock = defaultdict(int)
+    for meal_id, quantity in released:
+        restock[meal_id] += quantity
+    if restock:
+        meals = Meal.__table__
+        await db.execute(
+            update(meals)
+            .where(meals.c.id == bindparam("row_id"), meals.c.unlimited.isnot(True), meals.c.quantity.isnot(None))
+            .values(quantity=meals.c.quantity + bindparam("restock")),
+            [{"row_id": meal_id, "restock": quantity} for meal_id, quantity in sorted(restock.items())],
+        )
+    await db.commit()
+    RESERVATIONS.inc(len(released), outcome="released")
+    return len(released)
+
+
+async def release_order_reservations(db: AsyncSession, order_id: str) -> int:
+    """Return an unpaid order's held stock (checkout failed or its session expired)."""
+    return await _release(db, Reservation.order_id == order_id)
+
+
+async def release_expired_reservations() -> int:
+    """Return the stock of every expired hold, in batches; safe to run from several workers at once."""
+    total = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            expired = (
+                select(Reservation.id)
+                .where(Reservation.status == "held", Reservation.expires_at < datetime.utcnow())
+                .limit(RELEASE_BATCH_SIZE)
+            )
+            released = await _release(db, Reservation.id.in_(expired))
+            total += released
+            if released < RELEASE_BATCH_SIZE:
+                return total
+
+
+async def release_expired_reservations_forever():
+    """Background loop started with the app (see main.py)."""
+    while True:
+        await asyncio.sleep(RESERVATION_RELEASE_INTERVAL_SECONDS)
+        try:
+            released = await release_expired_reservations()
+            if released:
+                logger.info(f"Released {released} expired reservations", extra={"released": released})
+        except Exception:
+            logger.exception("Releasing expired reservations failed")
+
+
+if __name__ == "__main__":
+    print(f"Released {asyncio.run(release_expired_reservations())} expired reservations")
@@ -0,0 +1,92 @@
+import functools
+import inspect
+import json
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# Name of the extra parameter used to receive FastAPI's per-request sub-response
+_SUB_RESPONSE_PARAM = "_fast_json_sub_response"
+
+
+def _serializing_endpoint(endpoint, adapter: TypeAdapter, status_code):
+    """
+    Wrap an endpoint so its return value is validated and dumped to JSON bytes by a
+    prebuilt TypeAdapter, skipping FastAPI's jsonable_encoder pass.
+    """
+    signature = inspect.signature(endpoint)
+    parameters = list(signature.parameters.values())
+
+    # FastAPI injects a single sub-response per request; reuse the endpoint's own
+    # `response: Response` parameter if it declares one
+    declared = [param.name for param in parameters if param.annotation is Response]
+    sub_response_name = declared[0] if declared else _SUB_RESPONSE_PARAM
+    if not declared:
+        parameters.append(inspect.Parameter(_SUB_RESPONSE_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Response))
+
+    def build_response(result, sub_response: Response):
+        if isinstance(result, Response):
+            return result
+        body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+        response = Response(
+            content=body,
+            status_code=sub_response.status_code or status_code or 200,
+            media_type="application/json",
+        )
+        # Keep headers the endpoint set on an injected `response: Response`
+        response.headers.raw.extend(
+            (key, value) for key, value in sub_response.headers.raw if key != b"content-length"
+        )
+        return response
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            sub_response = kwargs[sub_response_name] if declared else kwargs.pop(sub_response_name)
+            return build_response(await endpoint(*args, **kwargs), sub_response)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            sub_response = kwargs[sub_response_name] if declared else kwargs.pop(sub_response_name)
+            return build_response(endpoint(*args, **kwargs), sub_response)
+
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    wrapper.fast_json_wrapped = True
+    return wrapper
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route class that serialises `response_model` results with a TypeAdapter built once
+    at startup. Opt in per router with `APIRouter(route_class=FastJSONRoute)`.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        response_model = kwargs.get("response_model")
+        # include_router() rebuilds routes from already-wrapped endpoints; wrap only once
+        if (
+            response_model is not None
+            and not isinstance(response_model, DefaultPlaceholder)
+            and not getattr(endpoint, "fast_json_wrapped", False)
+        ):
+            endpoint = _serializing_endpoint(endpoint, TypeAdapter(response_model), kwargs.get("status_code"))
+        super().__init__(path, endpoint, **kwargs)
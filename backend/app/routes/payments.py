@@ -1,15 +1,17 @@
 import json
 import stripe
 import logging
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, HTTPException, Depends, Request
+from starlette.concurrency import run_in_threadpool
 import os
 from dotenv import load_dotenv
 from app.schemas import OrderCreate
-from app.models import Order, Meal, ChefOrder
 from uuid import uuid4
-from app.database import get_db
-from app.crud import get_user_by_email, create_user
+from app.database import get_async_db
+from app.crud import get_user_by_email_async, create_user_async
+from app.reservations import order_quantities, hold_stock, release_order_reservations, checkout_session_expires_at
+from app.webhooks import record_event
 
 # Load environment variables
 load_dotenv()
@@ -22,7 +24,7 @@ FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 if not STRIPE_SECRET_KEY:
     raise ValueError("STRIPE_SECRET_KEY environment variable is not set")
 if not WEBHOOK_SECRET:
-    logging.warning("STRIPE_WEBHOOK_SECRET environment variable is not set. Webhooks will not work.")
+    logging.getLogger(__name__).warning("STRIPE_WEBHOOK_SECRET environment variable is not set. Webhooks will not work.")
 
 stripe.api_key = STRIPE_SECRET_KEY
 
@@ -32,19 +34,26 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/api/create-checkout-session")
-async def create_checkout_session(order: OrderCreate, db: Session = Depends(get_db)):
+async def create_checkout_session(order: OrderCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create a Stripe checkout session for the order
     
+    The ordered quantities are held (409 if a meal has sold out) until the session is paid or expires.
     The actual order is created in the webhook after successful payment
     """
     # Generate a unique order ID (but do not create the order yet)
     order_id = str(uuid4())
+    quantities = order_quantities(order.meals)
+    if not quantities:
+        raise HTTPException(status_code=400, detail="Order has no meals")
 
     # Get or create the user (buyer)
-    user = get_user_by_email(db, order.email)
+    user = await get_user_by_email_async(db, order.email)
     if not user:
-        user = create_user(db, order.email)
+        user = await create_user_async(db, order.email)
+
+    # Hold the stock; it is released only after the Stripe session has expired
+    await hold_stock(db, order_id, quantities)
 
     # Prepare metadata for the webhook
     metadata = {
@@ -70,7 +79,9 @@ async def create_checkout_session(order: OrderCreate, db: Session = Depends(get_
             }
         ]
 
-        session = stripe.checkout.Session.create(
+        # The Stripe SDK call is blocking network I/O, keep it off the event loop
+        session = await run_in_threadpool(
+            stripe.checkout.Session.create,
             payment_method_types=["card"],
             mode="payment",
             success_url=f"{FRONTEND_URL}/success?session_id={{CHECKOUT_SESSION_ID}}",
@@ -78,6 +89,7 @@ async def create_checkout_session(order: OrderCreate, db: Session = Depends(get_
             line_items=line_items,
             metadata=metadata,
             customer_email=order.email,
+            expires_at=checkout_session_expires_at(),
         )
         
         logger.info(f"Created Stripe checkout session: {session.id} for order: {order_id}")
@@ -85,18 +97,21 @@ async def create_checkout_session(order: OrderCreate, db: Session = Depends(get_
         
     except stripe.error.StripeError as e:
         logger.error(f"Stripe error creating checkout session: {str(e)}")
+        await release_order_reservations(db, order_id)
         raise HTTPException(status_code=400, detail=f"Payment processing error: {str(e)}")
     except Exception as e:
         logger.error(f"Unexpected error creating checkout session: {str(e)}")
+        await release_order_reservations(db, order_id)
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.post("/webhook/stripe")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Handle Stripe webhook events
     
-    Creates orders and chef orders after successful payment
+    Verifies and stores the event, then acknowledges it right away; orders and chef orders are
+    created by the webhook workers (app/webhooks.py). Redelivered events are acknowledged and ignored.
     """
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
@@ -110,69 +125,5 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         logger.error(f"Invalid webhook signature: {str(e)}")
         raise HTTPException(status_code=400, detail="Invalid signature")
 
-    # Handle the checkout.session.completed event
-    if event["type"] == "checkout.session.completed":
-        session_data = event["data"]["object"]
-        
-        # Retrieve metadata
-        metadata = session_data.get("metadata", {})
-        order_id = metadata.get("order_id")
-        buyer_id = metadata.get("buyer_id")
-        total_price = float(metadata.get("total_price", 0))
-        meals_json = metadata.get("meals", "[]")
-        
-        try:
-            meals_data = json.loads(meals_json)
-        except json.JSONDecodeError:
-            logger.error(f"Invalid meals JSON in webhook metadata: {meals_json}")
-            raise HTTPException(status_code=400, detail="Invalid meals data")
-
-        # Extract meal IDs
-        meal_ids = [meal.get("id") for meal in meals_data if meal.get("id")]
-        
-        if not meal_ids:
-            logger.error(f"No meal IDs found in webhook metadata for order {order_id}")
-            raise HTTPException(status_code=400, detail="No meals in order")
-
-        try:
-            # Query the Meal model to get the Meal instances
-            meal_instances = db.query(Meal).filter(Meal.id.in_(meal_ids)).all()
-            
-            if not meal_instances:
-                logger.error(f"No meals found for IDs: {meal_ids}")
-                raise HTTPException(status_code=404, detail="Meals not found")
-
-            # Create the main order
-            new_order = Order(
-                id=order_id,
-                buyer_id=buyer_id,
-                total_price=total_price,
-                status="pending"
-            )
-            db.add(new_order)
-            db.flush()  # Flush to get the order ID
-            
-            logger.info(f"Created order: {order_id} for buyer: {buyer_id}")
-
-            # Create chef orders for each meal
-            for meal in meal_instances:
-                chef_order = ChefOrder(
-                    chef_id=meal.seller_id,
-                    order_id=new_order.id,
-                    buyer_id=buyer_id,  # Now properly included
-                    meal_id=meal.id,
-                    status="pending",
-                )
-                db.add(chef_order)
-                logger.info(f"Created chef order for chef: {meal.seller_id}, meal: {meal.id}")
-
-            # Commit all changes
-            db.commit()
-            logger.info(f"Successfully committed order {order_id} and chef orders")
-            
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Database error processing webhook: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error creating order")
-
-    return {"status": "success"}
+    stored = await record_event(db, event["id"], event["type"], payload.decode("utf-8"))
+    return {"status": "success" if stored else "duplicate"}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Union
+from typing import Dict, Optional, List, Union
 from datetime import datetime
 
 class UserCreate(BaseModel):
@@ -75,7 +75,31 @@ class MealUpdate(BaseModel):
     unlimited: Optional[bool]
 
 
-class MealResponse(BaseModel):
+class RatingSummary(BaseModel):
+    average_rating: float
+    review_count: int
+
+
+class RatingSummaries(BaseModel):
+    """Rating summaries keyed by chef ID and meal ID (unknown IDs are omitted)"""
+    chefs: Dict[str, RatingSummary] = {}
+    meals: Dict[int, RatingSummary] = {}
+
+
+class SellerSummary(BaseModel):
+    """Compact seller info for list views"""
+    id: str
+    username: str
+    profile_picture: Optional[str] = None
+    rating: str | None
+    rating_summary: Optional[RatingSummary] = None  # Only filled when requested (e.g. /meals/?include_ratings=true)
+
+    class Config:
+        from_attributes = True
+
+
+class MealSummary(BaseModel):
+    """Meal fields rendered by list views (discovery, menus, carts)"""
     id: int
     name: str
     description: Optional[str] = None
@@ -84,22 +108,28 @@ class MealResponse(BaseModel):
     image_url: Optional[str] = None
     quantity: int | str | None
     seller_id: str
-    seller: UserResponse
+    seller: SellerSummary
     latitude: Optional[float] = None
     longitude: Optional[float] = None
     distance: Optional[float] = None  # To include distance in the response if applicable
     timeslots: Optional[list] = None
     unlimited: bool
- 
+    thumbnail_url: Optional[str] = None  # Set once the upload pipeline has stored the WebP thumbnail
+    rating_summary: Optional[RatingSummary] = None  # Only filled when requested (e.g. /meals/?include_ratings=true)
 
     class Config:
         from_attributes = True
 
 
+class MealResponse(MealSummary):
+    """Full meal details, including the complete seller profile"""
+    seller: UserResponse
+
+
 class CartItemSchema(BaseModel):
     meal_id: int
     quantity: int
-    meal: MealResponse
+    meal: MealSummary
 
 class FullCartSchema(BaseModel):
     user_id: str
@@ -120,11 +150,14 @@ class ChefOrderCreate(BaseModel):
 # Schema for returning a ChefOrder response
 class ChefOrderResponse(BaseModel):
     id: int
-    chef_id: int
-    order_id: int
+    chef_id: str
+    order_id: str
+    buyer_id: str
     meal_id: int
+    quantity: int = 1
     status: str
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -142,8 +175,8 @@ class ReviewCreate(ReviewBase):
 class ReviewOut(ReviewBase):
     id: int
     reviewer_id: str
-    meal_id: str
-    order_id: str
+    meal_id: int
+    order_id: Optional[str] = None
     chef_id: str
     created_at: datetime
 
@@ -0,0 +1,189 @@
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.models import Meal
+
+# Meal text search. Postgres ranks with pg_trgm (see crud.search_meals); other databases use
+# MealSearchIndex, an in-process trigram inverted index with the same scoring idea.
+
+# Relative weight of a match in each field
+SEARCH_FIELD_WEIGHTS = {
+    "name": 1.0,
+    "ingredients": 0.6,
+    "description": 0.3,
+}
+
+# Fraction of the query's trigrams a field must contain to count as a match
+# (pg_trgm's word_similarity_threshold defaults to 0.6)
+MIN_WORD_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.6"))
+
+# Most candidates the fallback index hands to the database for location filtering
+MAX_CANDIDATES = 1000
+
+_WORD = re.compile(r"\w+")
+
+logger = logging.getLogger(__name__)
+
+
+def trigrams(text: str) -> Set[str]:
+    """pg_trgm-style trigrams: lowercase words padded with two leading spaces and one trailing."""
+    grams = set()
+    for word in _WORD.findall((text or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def meal_document(name, description, ingredients) -> Dict[str, Set[str]]:
+    return {"name": trigrams(name), "description": trigrams(description), "ingredients": trigrams(ingredients)}
+
+
+def _index_document(postings, documents, meal_id: int, document: Optional[Dict[str, Set[str]]]):
+    """Replace a meal's postings with `document` (None removes the meal)."""
+    previous = documents.pop(meal_id, None)
+    for field, grams in (previous or {}).items():
+        for gram in grams:
+            postings[field][gram].discard(meal_id)
+    if document is not None:
+        documents[meal_id] = document
+        for field, grams in document.items():
+            for gram in grams:
+                postings[field][gram].add(meal_id)
+
+
+class MealSearchIndex:
+    """
+    Trigram -> meal ID postings per searchable field, kept in memory.
+    Meal writes made through the ORM update it once their transaction commits; it is also rebuilt
+    from the database every `refresh_seconds` to pick up bulk loads and writes from other processes.
+    Rebuilds run in the background and are swapped in whole, so searches only wait for the first build.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._postings: Dict[str, Dict[str, Set[int]]] = {}
+        self._documents: Dict[int, Dict[str, Set[str]]] = {}
+        self._built_at = None
+        self._replay: Optional[List[Tuple[int, Optional[Dict[str, Set[str]]]]]] = None  # Writes during a rebuild
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()  # Held by the one build in progress
+
+    @property
+    def built(self) -> bool:
+        return self._built_at is not None
+
+    def rebuild(self, db: Session):
+        """Build a fresh index from the database and swap it in; searches use the old one meanwhile."""
+        with self._lock:
+            self._replay = []
+        postings = {field: defaultdict(set) for field in SEARCH_FIELD_WEIGHTS}
+        documents = {}
+        rows = db.query(Meal.id, Meal.name, Meal.description, Meal.ingredients).yield_per(10000)
+        for meal_id, name, description, ingredients in rows:
+            _index_document(postings, documents, meal_id, meal_document(name, description, ingredients))
+        with self._lock:
+            # Writes committed while the rows were read may be missing from them; apply them again
+            for meal_id, document in self._replay:
+                _index_document(postings, documents, meal_id, document)
+            self._replay = None
+            self._postings, self._documents = postings, documents
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self, db: Session):
+        """Build the index on first use (blocking); once stale, rebuild it on a background thread."""
+        if not self.built:
+            with self._build_lock:
+                if not self.built:
+                    self.rebuild(db)
+            return
+        if time.monotonic() - self._built_at > self.refresh_seconds and self._build_lock.acquire(blocking=False):
+            threading.Thread(target=self._rebuild_in_background, args=(db.get_bind(),),
+                             name="search-index-rebuild", daemon=True).start()
+
+    def _rebuild_in_background(self, bind):
+        try:
+            with Session(bind=bind) as db:
+                self.rebuild(db)
+        except Exception:
+            logger.exception("Rebuilding the meal search index failed")
+        finally:
+            self._build_lock.release()
+
+    def add(self, meal_id: int, document: Dict[str, Set[str]]):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((meal_id, document))
+            if self.built:
+                _index_document(self._postings, self._documents, meal_id, document)
+
+    def remove(self, meal_id: int):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((meal_id, None))
+            if self.built:
+                _index_document(self._postings, self._documents, meal_id, None)
+
+    def search(self, query: str, limit: int = MAX_CANDIDATES) -> Dict[int, float]:
+        """Best-scoring meal IDs for `query`, as {meal_id: score} in descending score order."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return {}
+
+        scores = defaultdict(float)
+        with self._lock:
+            for field, weight in SEARCH_FIELD_WEIGHTS.items():
+                hits = Counter()
+                postings = self._postings.get(field, {})
+                for gram in query_grams:
+                    hits.update(postings.get(gram, ()))
+                for meal_id, count in hits.items():
+                    similarity = count / len(query_grams)
+                    if similarity >= MIN_WORD_SIMILARITY:
+                        scores[meal_id] += weight * similarity
+
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return dict(best)
+
+
+meal_search_index = MealSearchIndex(refresh_seconds=float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "300")))
+
+
+# Keep the in-process index in step with ORM writes (a no-op until the first search builds it).
+# Meals written in a flush are collected and applied once the transaction commits, so rolled-back
+# writes never become searchable.
+@event.listens_for(Session, "after_flush")
+def _collect_meal_writes(session, flush_context):
+    if not meal_search_index.built:
+        return
+    changes = session.info.setdefault("search_index_meals", {})  # Meal ID -> document, or None if deleted
+    for meal in session.new:
+        if isinstance(meal, Meal):
+            changes[meal.id] = meal_document(meal.name, meal.description, meal.ingredients)
+    for meal in session.dirty:
+        if isinstance(meal, Meal) and any(inspect(meal).attrs[field].history.has_changes() for field in SEARCH_FIELD_WEIGHTS):
+            changes[meal.id] = meal_document(meal.name, meal.description, meal.ingredients)
+    for meal in session.deleted:
+        if isinstance(meal, Meal):
+            changes[meal.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _index_committed_meal_writes(session):
+    for meal_id, document in session.info.pop("search_index_meals", {}).items():
+        if document is None:
+            meal_search_index.remove(meal_id)
+        else:
+            meal_search_index.add(meal_id, document)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_meal_writes(session):
+    session.info.pop("search_index_meals", None)
@@ -0,0 +1,13 @@
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+
+# The models use Postgres JSONB columns. SQLite (local runs, tests, benchmarks) has no JSONB type;
+# call use_json_for_sqlite_jsonb() before creating tables there to store them as plain JSON.
+
+
+def use_json_for_sqlite_jsonb():
+    """Let the Postgres JSONB columns be created on SQLite (stored as plain JSON)."""
+
+    @compiles(JSONB, "sqlite")
+    def _compile_jsonb(type_, compiler, **kw):
+        return "JSON"
@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Pickup timeslots are stored on meals as [{"start": "HH:MM", "end": "HH:MM"}, ...] (local clock time).
+# For availability filtering each slot is also kept as a half-open minute-of-day range
+# [start_minute, end_minute) in the meal_timeslots table, see models.MealTimeslot.
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def minute_of_day(value: str) -> int:
+    """Returns minutes since midnight for an "HH:MM" string (raises ValueError if malformed)."""
+    parsed = datetime.strptime(value, "%H:%M")
+    return parsed.hour * 60 + parsed.minute
+
+
+def slot_ranges(timeslots: Optional[list]) -> List[Tuple[int, int]]:
+    """
+    Returns the (start_minute, end_minute) range of every well-formed slot.
+    Malformed or empty slots (only possible in rows written before validation) are skipped.
+    """
+    ranges = []
+    for slot in timeslots or []:
+        try:
+            start, end = minute_of_day(slot["start"]), minute_of_day(slot["end"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if start < end:
+            ranges.append((start, end))
+    return ranges
+
+
+def query_windows(available_at: str, available_until: Optional[str] = None) -> List[Tuple[int, int]]:
+    """
+    Minute ranges a meal's slot must overlap to match an availability filter.
+    A bare `available_at` matches slots covering that minute; a window ending before it
+    starts wraps past midnight and is split in two.
+    """
+    start = minute_of_day(available_at)
+    if available_until is None:
+        return [(start, start + 1)]
+    end = minute_of_day(available_until)
+    if start < end:
+        return [(start, end)]
+    return [(start, MINUTES_PER_DAY)] + ([(0, end)] if end > 0 else [])
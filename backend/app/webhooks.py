@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
+from app.metrics import Counter, Histogram
+from app.models import ChefOrder, Meal, Order, StripeEvent, order_meal_association
+from app.order_feed import publish_chef_orders
+from app.reservations import order_quantities, commit_reservations, release_order_reservations
+
+# Stripe webhooks are acknowledged as soon as the verified event is stored (see routes/payments.py).
+# A pool of workers started with the app processes stored events, retrying failures with exponential
+# backoff; redelivered events are dropped by the primary key on stripe_events.
+#
+# To process events in a separate process instead (with WEBHOOK_WORKERS=0 on the API), run from
+# the backend directory:
+#   python -m app.webhooks
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+
+# How often stored events that are due (retries, backlog from a restart) are picked up
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "5"))
+
+RETRY_BASE_SECONDS = 2
+RETRY_MAX_SECONDS = 600
+LEASE_SECONDS = 300  # An event claimed by a worker that died is retried after this long
+POLL_BATCH_SIZE = 500
+
+EVENTS = Counter("stripe_webhook_events", "Stripe webhook events by type and outcome", ("type", "outcome"))
+PROCESSING_DURATION = Histogram("stripe_webhook_processing_seconds", "Time to process one stored Stripe event", ("type",))
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidEvent(Exception):
+    """The event can never be processed (e.g. malformed metadata), so it is not retried."""
+
+
+# Store a verified event (returns False when Stripe redelivered one already stored)
+async def record_event(db: AsyncSession, event_id: str, event_type: str, payload: str) -> bool:
+    db.add(StripeEvent(id=event_id, type=event_type, payload=payload))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        EVENTS.inc(type=event_type, outcome="duplicate")
+        return False
+    EVENTS.inc(type=event_type, outcome="received")
+    _enqueue(event_id)
+    return True
+
+
+async def _checkout_completed(db: AsyncSession, session_data: dict):
+    """Create the order and its chef orders, and turn the checkout holds into sales."""
+    metadata = session_data.get("metadata", {})
+    order_id = metadata.get("order_id")
+    buyer_id = metadata.get("buyer_id")
+    total_price = float(metadata.get("total_price", 0))
+    meals_json = metadata.get("meals", "[]")
+
+    try:
+        meals_data = json.loads(meals_json)
+    except json.JSONDecodeError:
+        raise InvalidEvent(f"Invalid meals JSON in webhook metadata: {meals_json}")
+
+    # Quantity per meal ID
+    try:
+        quantities = order_quantities(meals_data)
+    except HTTPException as e:
+        raise InvalidEvent(e.detail)
+    if not order_id or not quantities:
+        raise InvalidEvent(f"No order or meal IDs in webhook metadata for order {order_id}")
+
+    # Stripe can send several events for one session; the order is only created once
+    if await db.get(Order, order_id) is not None:
+        logger.info(f"Order {order_id} already exists, skipping", extra={"order_id": order_id})
+        return
+
+    # Seller of each ordered meal (meals deleted since checkout are left out of the order)
+    sellers = dict((await db.execute(select(Meal.id, Meal.seller_id).where(Meal.id.in_(quantities)))).all())
+    if not sellers:
+        raise InvalidEvent(f"No meals found for IDs: {sorted(quantities)}")
+    line_items = sorted(sellers)
+
+    # One multi-row INSERT per table, so orders of any size take the same number of round trips
+    await db.execute(insert(Order).values(id=order_id, buyer_id=buyer_id, total_price=total_price, status="pending"))
+    await db.execute(insert(order_meal_association).values([
+        {"order_id": order_id, "meal_id": meal_id, "quantity": quantities[meal_id]} for meal_id in line_items
+    ]))
+    await db.execute(insert(ChefOrder).values([
+        {
+            "order_id": order_id,
+            "buyer_id": buyer_id,
+            "meal_id": meal_id,
+            "chef_id": sellers[meal_id],
+            "quantity": quantities[meal_id],
+            "status": "pending",
+        }
+        for meal_id in line_items
+    ]))
+    # Wake the sellers' live order feeds once this commits
+    await db.run_sync(publish_chef_orders, set(sellers.values()))
+
+    # Turn the checkout holds into sales (same transaction as the order)
+    oversold = await commit_reservations(db, order_id, {meal_id: quantities[meal_id] for meal_id in line_items})
+    if oversold:
+        logger.error(
+            f"Order {order_id} was paid after its hold expired and oversold meals {oversold}",
+            extra={"order_id": order_id, "oversold_meal_ids": oversold},
+        )
+
+    logger.info(
+        f"Created order {order_id} and {len(line_items)} chef orders",
+        extra={"order_id": order_id, "chef_order_count": len(line_items)},
+    )
+
+
+async def _checkout_expired(db: AsyncSession, session_data: dict):
+    """The buyer never paid: return the held stock."""
+    order_id = session_data.get("metadata", {}).get("order_id")
+    if order_id:
+        released = await release_order_reservations(db, order_id)
+        logger.info(f"Released {released} held meals for expired order {order_id}", extra={"order_id": order_id})
+
+
+# Event types with side effects; every other type is marked done untouched
+HANDLERS = {
+    "checkout.session.completed": _checkout_completed,
+    "checkout.session.expired": _checkout_expired,
+}
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, in seconds, after the given number of failed attempts."""
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+async def _claim(db: AsyncSession, event_id: str):
+    # Atomic claim, so an event is never processed by two workers (or processes) at once
+    now = datetime.utcnow()
+    claimed = (await db.execute(
+        update(StripeEvent)
+        .where(
+            StripeEvent.id == event_id,
+            StripeEvent.status.in_(("pending", "processing")),
+            StripeEvent.next_attempt_at <= now,
+        )
+        .values(status="processing", attempts=StripeEvent.attempts + 1, next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+        .returning(StripeEvent.type, StripeEvent.payload, StripeEvent.attempts)
+        .execution_options(synchronize_session=False)
+    )).first()
+    await db.commit()
+    return claimed
+
+
+async def _set_status(db: AsyncSession, event_id: str, **values):
+    await db.execute(
+        update(StripeEvent).where(StripeEvent.id == event_id).values(**values).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def process_event(event_id: str) -> Optional[str]:
+    """
+    Process one stored event if it is due and not held by another worker.
+    Returns the new status ("done", "pending" for a scheduled retry, or "failed"), or None if not claimed.
+    """
+    async with AsyncSessionLocal() as db:
+        claimed = await _claim(db, event_id)
+        if claimed is None:
+            return None
+        event_type, payload, attempts = claimed
+
+        start = time.perf_counter()
+        try:
+            handler = HANDLERS.get(event_type)
+            if handler:
+                await handler(db, json.loads(payload)["data"]["object"])
+            # Marked done in the handler's transaction, so its effects apply exactly once
+            await _set_status(db, event_id, status="done", processed_at=datetime.utcnow(), last_error=None)
+            EVENTS.inc(type=event_type, outcome="processed" if handler else "ignored")
+            return "done"
+        except Exception as e:
+            await db.rollback()
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, InvalidEvent) or attempts >= WEBHOOK_MAX_ATTEMPTS:
+                await _set_status(db, event_id, status="failed", last_error=error)
+                EVENTS.inc(type=event_type, outcome="failed")
+                logger.error(f"Giving up on Stripe event {event_id} after {attempts} attempts: {error}", extra={"event_id": event_id})
+                return "failed"
+            delay = retry_delay(attempts)
+            await _set_status(db, event_id, status="pending", last_error=error, next_attempt_at=datetime.utcnow() + timedelta(seconds=delay))
+            EVENTS.inc(type=event_type, outcome="retried")
+            logger.warning(f"Stripe event {event_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}", extra={"event_id": event_id})
+            return "pending"
+        finally:
+            PROCESSING_DURATION.observe(time.perf_counter() - start, type=event_type)
+
+
+async def due_event_ids(limit: int = POLL_BATCH_SIZE) -> List[str]:
+    """Stored events ready to be (re)tried, oldest first."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(StripeEvent.id)
+            .where(StripeEvent.status.in_(("pending", "processing")), StripeEvent.next_attempt_at <= datetime.utcnow())
+            .order_by(StripeEvent.next_attempt_at)
+            .limit(limit)
+        )
+        return list(result.scalars())
+
+
+# In-process work queue: the webhook route pushes new event IDs and the poller pushes due ones
+_queue: Optional[asyncio.Queue] = None
+_queued = set()
+
+
+def _enqueue(event_id: str):
+    if _queue is not None and event_id not in _queued:
+        _queued.add(event_id)
+        _queue.put_nowait(event_id)
+
+
+async def _work(queue: asyncio.Queue):
+    while True:
+        event_id = await queue.get()
+        _queued.discard(event_id)
+        try:
+            await process_event(event_id)
+        except Exception:
+            logger.exception(f"Processing Stripe event {event_id} failed")
+        finally:
+            queue.task_done()
+
+
+async def _poll():
+    while True:
+        try:
+            for event_id in await due_event_ids():
+                _enqueue(event_id)
+        except Exception:
+            logger.exception("Polling for due Stripe events failed")
+        await asyncio.sleep(WEBHOOK_POLL_SECONDS)
+
+
+def start_webhook_workers(workers: int = WEBHOOK_WORKERS) -> List[asyncio.Task]:
+    """Start the worker pool and poller on the running event loop; cancel the returned tasks to stop."""
+    global _queue
+    _queue = asyncio.Queue()
+    _queued.clear()
+    return [asyncio.create_task(_work(_queue)) for _ in range(workers)] + [asyncio.create_task(_poll())]
+
+
+def stop_webhook_workers(tasks: List[asyncio.Task]):
+    global _queue
+    for task in tasks:
+        task.cancel()
+    _queue = None
+
+
+async def _run_forever():
+    start_webhook_workers(max(WEBHOOK_WORKERS, 1))
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(_run_forever())
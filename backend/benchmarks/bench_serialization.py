@@ -0,0 +1,88 @@
+"""
+Serialization microbenchmark: FastAPI's default response path (response_model validation +
+jsonable_encoder + JSONResponse) against app.responses (prebuilt TypeAdapter straight to bytes).
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_serialization --sizes 10 100 1000
+
+Prints one JSON object per payload size with the mean time per response in microseconds.
+"""
+import argparse
+import asyncio
+import json
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from pydantic import TypeAdapter
+
+from app.schemas import MealSummary
+
+
+def make_meals(count):
+    """ORM-like objects shaped like a /meals/ page."""
+    seller = SimpleNamespace(id="seller-1", username="chefmike", profile_picture="https://example.com/p.jpg", rating="4.8")
+    return [
+        SimpleNamespace(
+            id=i,
+            name=f"Meal {i}",
+            description="Fresh ingredients with homemade salsa",
+            ingredients="chicken, rice, beans, cheese, salsa",
+            price=8.99,
+            image_url=f"https://storage.googleapis.com/bucket/meal-images/{i}.jpg",
+            quantity=5,
+            seller_id=seller.id,
+            seller=seller,
+            latitude=36.1447,
+            longitude=-86.8027,
+            distance=342.0,
+            timeslots=[{"start": "11:00", "end": "13:00"}],
+            unlimited=False,
+            created_at=datetime(2025, 1, 10, 8, 0),
+        )
+        for i in range(count)
+    ]
+
+
+LOOP = asyncio.new_event_loop()
+
+
+def default_path(field, meals):
+    content = LOOP.run_until_complete(serialize_response(field=field, response_content=meals, is_coroutine=True))
+    return JSONResponse(content).body
+
+
+def fast_path(adapter, meals):
+    return adapter.dump_json(adapter.validate_python(meals, from_attributes=True))
+
+
+def run(sizes, repeat):
+    field = APIRoute("/meals/", lambda: None, response_model=List[MealSummary]).response_field
+    adapter = TypeAdapter(List[MealSummary])
+
+    for size in sizes:
+        meals = make_meals(size)
+        assert json.loads(default_path(field, meals)) == json.loads(fast_path(adapter, meals))
+
+        number = max(1, repeat // size)
+        default_us = min(timeit.repeat(lambda: default_path(field, meals), number=number, repeat=5)) / number * 1e6
+        fast_us = min(timeit.repeat(lambda: fast_path(adapter, meals), number=number, repeat=5)) / number * 1e6
+        print(json.dumps({
+            "benchmark": "serialization",
+            "items": size,
+            "default_us": round(default_us, 1),
+            "fast_us": round(fast_us, 1),
+            "speedup": round(default_us / fast_us, 2),
+        }))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare response serialization paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20000, help="Approximate items serialised per timing run")
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
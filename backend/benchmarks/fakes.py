@@ -0,0 +1,142 @@
+"""
+In-process stand-ins for Stripe and Firebase so the app can be benchmarked offline.
+
+Call `install()` before importing anything from `app` (app.auth initialises Firebase at import).
+"""
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+from app.sqlite_compat import use_json_for_sqlite_jsonb
+
+FAKE_STRIPE_SECRET_KEY = "sk_test_bench"
+FAKE_WEBHOOK_SECRET = "whsec_bench"
+
+
+class FakeBlob:
+    def __init__(self, path: str):
+        self.public_url = f"https://storage.example.com/bench/{path}"
+
+    def upload_from_string(self, data, content_type=None):
+        pass
+
+    def make_public(self):
+        pass
+
+    def exists(self):
+        return True
+
+
+class FakeBucket:
+    def blob(self, path: str) -> FakeBlob:
+        return FakeBlob(path)
+
+
+class FakeFirebaseAuth:
+    """Users live in memory; ID tokens are the strings `bench-token:<uid>`."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def register(self, uid: str, email: str):
+        with self._lock:
+            self._users[email] = SimpleNamespace(uid=uid, email=email)
+
+    def get_user_by_email(self, email):
+        from firebase_admin import auth
+
+        time.sleep(self.latency)
+        with self._lock:
+            user = self._users.get(email)
+        if user is None:
+            raise auth.UserNotFoundError(f"No user record found for the provided email: {email}")
+        return user
+
+    def create_user(self, email=None, **kwargs):
+        time.sleep(self.latency)
+        uid = "bench-" + hashlib.sha1(email.encode()).hexdigest()[:20]
+        self.register(uid, email)
+        return self._users[email]
+
+    def verify_id_token(self, token, *args, **kwargs):
+        from firebase_admin import auth
+
+        if not token.startswith("bench-token:"):
+            raise auth.InvalidIdTokenError("Not a benchmark token")
+        return {"uid": token.split(":", 1)[1], "exp": time.time() + 3600}
+
+    def verify_firebase_token(self, token, request, audience=None, clock_skew_in_seconds=0):
+        """Stands in for google.oauth2.id_token.verify_firebase_token (what app.auth verifies with)."""
+        if not token.startswith("bench-token:"):
+            raise ValueError("Not a benchmark token")
+        uid = token.split(":", 1)[1]
+        return {"sub": uid, "user_id": uid, "aud": audience, "exp": time.time() + 3600}
+
+
+class FakeCheckoutSessions:
+    """
+    Replaces stripe.checkout.Session.create; `latency` simulates the Stripe round trip.
+    Like Stripe, rejects an `expires_at` less than 30 minutes or more than 24 hours after creation.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def create(self, **kwargs):
+        import stripe
+
+        time.sleep(self.latency)
+        expires_at = kwargs.get("expires_at")
+        if expires_at is not None and not time.time() + 1800 <= expires_at <= time.time() + 86400:
+            raise stripe.error.InvalidRequestError(
+                "The `expires_at` timestamp must be between 30 minutes and 24 hours from Checkout Session creation.",
+                "expires_at",
+            )
+        session_id = f"cs_bench_{uuid.uuid4().hex}"
+        return SimpleNamespace(id=session_id, url=f"https://checkout.example.com/{session_id}", metadata=kwargs.get("metadata"))
+
+
+def signed_webhook(event: dict, secret: str = FAKE_WEBHOOK_SECRET):
+    """Body and Stripe-Signature header that stripe.Webhook.construct_event accepts."""
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return payload.encode(), f"t={timestamp},v1={signature}"
+
+
+def install(stripe_latency: float = 0.0, firebase_latency: float = 0.0):
+    """Patch stripe and firebase_admin in place; returns the fake auth so callers can register users."""
+    # Forced rather than defaulted, so real keys from the shell or .env are never used
+    os.environ["STRIPE_SECRET_KEY"] = FAKE_STRIPE_SECRET_KEY
+    os.environ["STRIPE_WEBHOOK_SECRET"] = FAKE_WEBHOOK_SECRET
+    os.environ.setdefault("FIREBASE_CREDENTIALS_PATH", "bench-credentials.json")
+
+    import firebase_admin
+    import stripe
+    from firebase_admin import auth, credentials, storage
+    from google.oauth2 import id_token as google_id_token
+
+    credentials.Certificate = lambda path: None
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+
+    fake_auth = FakeFirebaseAuth(latency=firebase_latency)
+    auth.get_user_by_email = fake_auth.get_user_by_email
+    auth.create_user = fake_auth.create_user
+    auth.verify_id_token = fake_auth.verify_id_token
+    # The real verifier stays reachable for tests that check signed tokens
+    fake_auth.google_verify_firebase_token = google_id_token.verify_firebase_token
+    google_id_token.verify_firebase_token = fake_auth.verify_firebase_token
+    storage.bucket = lambda *args, **kwargs: FakeBucket()
+
+    # Webhook signatures are real HMACs (see signed_webhook), so construct_event stays unpatched
+    stripe.checkout.Session.create = FakeCheckoutSessions(latency=stripe_latency).create
+
+    use_json_for_sqlite_jsonb()
+    return fake_auth
@@ -0,0 +1,81 @@
+import os
+import tempfile
+
+# The app reads its configuration at import: point it at a scratch SQLite database first
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='campuseats-tests-'), 'test.db')}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["WEBHOOK_WORKERS"] = "0"
+os.environ["RESERVATION_RELEASE_INTERVAL_SECONDS"] = "0"
+os.environ["MEAL_CACHE_SIZE"] = "0"
+
+# Local Stripe and Firebase stand-ins (and JSONB on SQLite), as the benchmarks use
+from benchmarks import fakes  # noqa: E402
+
+fake_auth = fakes.install()
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app.auth import token_cache, user_cache  # noqa: E402
+from app.database import SessionLocal, engine, recent_writes  # noqa: E402
+from app.geo import grid_cell  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Base, Meal, User  # noqa: E402
+
+CAMPUS = (36.7421, -84.1655)
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    for cache in (token_cache, user_cache, recent_writes):
+        cache.clear()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def statements():
+    """SQL statements sent through the sync engine while the test runs."""
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def make_user(db, user_id, role="seller", **fields):
+    user = User(id=user_id, email=f"{user_id}@example.com", username=user_id, first_name="Test",
+                last_name="User", role=role, **fields)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def make_meals(db, seller_id, count, lat=CAMPUS[0], lon=CAMPUS[1], **fields):
+    meals = [Meal(name=f"Meal {i}", description="Test meal", ingredients="rice", price=8.0, quantity=10,
+                  seller_id=seller_id, latitude=lat, longitude=lon, geo_cell=grid_cell(lat, lon),
+                  timeslots=[{"start": "12:00", "end": "13:00"}], unlimited=False, **fields)
+             for i in range(count)]
+    db.add_all(meals)
+    db.commit()
+    return meals
+
+
+def auth_headers(user_id):
+    return {"Authorization": f"Bearer bench-token:{user_id}"}
@@ -0,0 +1,56 @@
+import datetime
+import json
+import time
+from types import SimpleNamespace
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+from google.oauth2 import id_token as google_id_token
+from app import auth
+from app.auth import FIREBASE_PROJECT_ID, ID_TOKEN_CERT_URL, CachedCertsRequest, verify_firebase_token
+from tests.conftest import fake_auth
+
+KEY_ID = "test-key"
+
+
+def signing_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(1).not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256()))
+    key_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return key_pem, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def firebase_token(key_pem, uid):
+    now = int(time.time())
+    claims = {"iss": f"https://securetoken.google.com/{FIREBASE_PROJECT_ID}", "aud": FIREBASE_PROJECT_ID,
+              "sub": uid, "iat": now, "exp": now + 3600}
+    return jwt.encode(crypt.RSASigner.from_string(key_pem, KEY_ID), claims).decode()
+
+
+def test_verification_uses_refreshed_certs(monkeypatch):
+    key_pem, cert_pem = signing_key()
+    fetched = []
+
+    def cert_endpoint(url, method="GET", **kwargs):
+        fetched.append(url)
+        return SimpleNamespace(status=200, headers={"cache-control": "public, max-age=3600"},
+                               data=json.dumps({KEY_ID: cert_pem}).encode())
+
+    monkeypatch.setattr(auth, "signing_request", CachedCertsRequest(cert_endpoint))
+    monkeypatch.setattr(google_id_token, "verify_firebase_token", fake_auth.google_verify_firebase_token)
+    monkeypatch.setattr(auth, "_start_cert_refresher", lambda: None)
+
+    auth.signing_request.refresh()
+    assert fetched == [ID_TOKEN_CERT_URL]
+
+    # Signature, audience and issuer are checked against the refreshed certs, without fetching again
+    assert verify_firebase_token(firebase_token(key_pem, "chef-0"))["uid"] == "chef-0"
+    assert verify_firebase_token(firebase_token(key_pem, "chef-1"))["uid"] == "chef-1"
+    assert fetched == [ID_TOKEN_CERT_URL]
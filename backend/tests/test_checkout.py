@@ -0,0 +1,81 @@
+import asyncio
+from datetime import timezone
+
+import pytest
+import stripe
+from sqlalchemy import func, select
+from benchmarks.fakes import FakeCheckoutSessions
+from app.database import AsyncSessionLocal
+from app.backfill_unlimited_meals import backfill_unlimited_meals
+from app.models import Meal, Reservation
+from app.reservations import hold_stock
+from tests.conftest import make_meals, make_user
+
+
+def checkout(client, meals):
+    return client.post("/api/create-checkout-session", json={"email": "buyer@example.com", "meals": meals, "total_price": 8.0})
+
+
+@pytest.mark.parametrize("meals", [[], [{"id": 1, "quantity": 0}]])
+def test_checkout_without_items_is_rejected(client, db, meals):
+    make_user(db, "chef-0")
+    make_meals(db, "chef-0", 1)
+
+    assert checkout(client, meals).status_code == 400
+    assert db.scalar(select(func.count(Reservation.id))) == 0
+    assert db.scalar(select(Meal.quantity)) == 10
+
+
+def test_empty_hold_stores_nothing(db):
+    async def hold():
+        async with AsyncSessionLocal() as session:
+            await hold_stock(session, "order-1", {})
+
+    asyncio.run(hold())
+    assert db.scalar(select(func.count(Reservation.id))) == 0
+
+
+def test_checkout_holds_stock(client, db):
+    make_user(db, "chef-0")
+    meal_id = make_meals(db, "chef-0", 1)[0].id
+
+    assert checkout(client, [{"id": meal_id, "quantity": 3}]).status_code == 200
+    assert db.scalar(select(Meal.quantity)) == 7
+    assert db.scalar(select(Reservation.status)) == "held"
+
+
+def test_meal_without_stock_count_is_unlimited(client, db):
+    make_user(db, "chef-0")
+    form = {"name": "Soup", "seller_id": "chef-0", "ingredients": "broth", "price": "4.0", "unlimited": "false",
+            "quantity": "Unlimited", "latitude": "36.7421", "longitude": "-84.1655",
+            "timeslots": '[{"start": "10:00", "end": "14:00"}]'}
+    created = client.post("/api/meals", data=form)
+    assert created.status_code == 200
+    assert (created.json()["unlimited"], created.json()["quantity"]) == (True, None)
+
+    assert checkout(client, [{"id": created.json()["id"], "quantity": 3}]).status_code == 200
+    assert db.scalar(select(Meal.quantity)) is None
+
+
+def test_backfill_converts_sentinel_quantities(db):
+    make_user(db, "chef-0")
+    sentinel, decremented, stocked = make_meals(db, "chef-0", 3)
+    sentinel.quantity, decremented.quantity = 99999999, 99999996
+    db.commit()
+
+    assert backfill_unlimited_meals() == 2
+    db.expire_all()
+    assert [(meal.unlimited, meal.quantity) for meal in (sentinel, decremented, stocked)] == [(True, None), (True, None), (False, 10)]
+
+
+def test_checkout_session_meets_stripe_expiry_bounds(client, db, monkeypatch):
+    # The fake rejects expires_at under 30 minutes from when it receives the call, as Stripe does
+    sessions = FakeCheckoutSessions(latency=1.0)
+    created = []
+    monkeypatch.setattr(stripe.checkout.Session, "create", lambda **kwargs: created.append(kwargs) or sessions.create(**kwargs))
+    make_user(db, "chef-0")
+    meal_id = make_meals(db, "chef-0", 1)[0].id
+
+    assert checkout(client, [{"id": meal_id, "quantity": 1}]).status_code == 200
+    hold_expires_at = db.scalar(select(Reservation.expires_at)).replace(tzinfo=timezone.utc).timestamp()
+    assert hold_expires_at > created[0]["expires_at"]
@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import httpx
+import stripe
+from benchmarks.fakes import FakeCheckoutSessions
+from app.main import app
+from tests.conftest import CAMPUS, make_meals, make_user
+
+STRIPE_LATENCY = 1.0
+SLOW_CHECKOUTS = 8
+
+
+def test_slow_checkouts_do_not_block_other_requests(db, monkeypatch):
+    # Checkouts waiting on Stripe must not hold up the event loop (head-of-line blocking)
+    monkeypatch.setattr(stripe.checkout.Session, "create", FakeCheckoutSessions(latency=STRIPE_LATENCY).create)
+    make_user(db, "chef-0")
+    make_user(db, "buyer-0", role="buyer")
+    meal_id = make_meals(db, "chef-0", 1)[0].id
+    order = {"email": "buyer-0@example.com", "meals": [{"id": meal_id, "quantity": 1}], "total_price": 8.0}
+
+    async def timed(request):
+        started = time.perf_counter()
+        response = await request
+        return response.status_code, time.perf_counter() - started
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            checkouts = [asyncio.create_task(timed(client.post("/api/create-checkout-session", json=order)))
+                         for _ in range(SLOW_CHECKOUTS)]
+            await asyncio.sleep(0.2)  # Let every checkout reach Stripe
+            meals = await timed(client.get("/meals/", params={"user_lat": CAMPUS[0], "user_lon": CAMPUS[1]}))
+            return meals, await asyncio.gather(*checkouts)
+
+    (meals_status, meals_seconds), checkouts = asyncio.run(run())
+    assert [status for status, _ in checkouts] == [200] * SLOW_CHECKOUTS
+    assert min(seconds for _, seconds in checkouts) >= STRIPE_LATENCY
+    assert meals_status == 200
+    assert meals_seconds < STRIPE_LATENCY / 4
@@ -0,0 +1,102 @@
+from math import nextafter
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app import crud, geo_cache
+from app.geo import distance_m
+from app.geo_cache import NearbyMealsCache, tile_center, tile_of
+from app.models import Base
+from app.pagination import NEXT_CURSOR_HEADER
+from tests.conftest import CAMPUS, make_meals, make_user
+
+# Meals are listed around a tile center, so cached pages reach as far as the candidates do
+ORIGIN = tile_center(*tile_of(*CAMPUS, 0.01), 0.01)[:2]
+
+
+@pytest.fixture
+def install_cache(monkeypatch):
+    """Enable a nearby meal cache and record, per page, whether it answered (False: the SQL query did)."""
+    # Cached distances one bit short of the database's, as a different libm could compute them
+    monkeypatch.setattr(geo_cache, "distance_m", lambda *points: nextafter(distance_m(*points), 0))
+
+    def install(max_candidates=100):
+        cache = NearbyMealsCache(maxsize=16, ttl=60, tile_deg=0.01, max_candidates=max_candidates)
+        answered, nearest = [], cache.nearest
+        monkeypatch.setattr(cache, "nearest", lambda *args, **kwargs: answered.append(nearest(*args, **kwargs)) or answered[-1])
+        monkeypatch.setattr(crud, "nearby_meals_cache", cache)
+        monkeypatch.setattr(geo_cache, "nearby_meals_cache", cache)
+        return answered
+    return install
+
+
+def add_meals(db, count, first_ring=1):
+    """Two meals per ring around ORIGIN (ties broken by ID), rings ~60 m apart."""
+    for ring in range(first_ring, first_ring + (count + 1) // 2):
+        make_meals(db, "chef-0", min(2, count), lat=ORIGIN[0] + ring * 0.0005, lon=ORIGIN[1])
+        count -= 2
+
+
+def walk(client, limit, between_pages=lambda: None):
+    ids, cursor = [], None
+    while True:
+        params = {"user_lat": ORIGIN[0], "user_lon": ORIGIN[1], "radius": 5000, "limit": limit}
+        response = client.get("/meals/", params={**params, **({"cursor": cursor} if cursor else {})})
+        ids += [meal["id"] for meal in response.json()]
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return ids
+        between_pages()
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4])
+def test_cached_pages_match_the_database(client, db, install_cache, limit):
+    make_user(db, "chef-0")
+    add_meals(db, 10)
+    expected = walk(client, 100)
+
+    answered = install_cache()
+    assert walk(client, limit) == expected
+    assert all(page is not None for page in answered)
+
+
+def test_walk_continues_in_sql_past_a_truncated_tile(client, db, install_cache):
+    make_user(db, "chef-0")
+    add_meals(db, 10)
+    expected = walk(client, 100)
+
+    answered = install_cache(max_candidates=5)
+    assert walk(client, 3) == expected
+    assert answered[0] is not None and None in answered
+
+
+def test_walk_continues_in_sql_after_an_invalidation(client, db, install_cache):
+    make_user(db, "chef-0")
+    add_meals(db, 6)
+    answered = install_cache(max_candidates=8)
+
+    # After the first page, more meals than the tile keeps land beyond the ones listed so far
+    added = iter([lambda: add_meals(db, 4, first_ring=4)])
+    listed = walk(client, 2, between_pages=lambda: next(added, lambda: None)())
+
+    assert answered[0] is not None and None in answered
+    assert listed == walk(client, 100)
+
+
+def test_tiles_load_from_the_primary(db, tmp_path, monkeypatch):
+    cache = NearbyMealsCache(maxsize=16, ttl=60, tile_deg=0.01, max_candidates=100)
+    monkeypatch.setattr(crud, "nearby_meals_cache", cache)
+    make_user(db, "chef-0")
+    meal_id = make_meals(db, "chef-0", 1)[0].id
+
+    # A replica that has not caught up with the meal yet
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(bind=replica)
+    with Session(replica) as replica_db:
+        crud.get_meals(replica_db, *CAMPUS, radius=1000)
+
+    def unexpected_load(*args):
+        raise AssertionError("tile was not cached")
+
+    page = cache.nearest(*CAMPUS, 1000, None, unexpected_load)
+    assert [cached_id for _, cached_id in page] == [meal_id]
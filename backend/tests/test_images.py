@@ -0,0 +1,79 @@
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from app import auth, endpoints
+from app.crud import record_image_upload
+from app.images import ImageUploader, LocalStorageBackend
+from tests.conftest import auth_headers, make_meals, make_user
+
+
+def png_bytes(size=(640, 480)):
+    out = BytesIO()
+    Image.new("RGB", size, (200, 80, 40)).save(out, format="PNG")
+    return out.getvalue()
+
+
+class FailingBackend(LocalStorageBackend):
+    def save(self, path, data, content_type):
+        raise OSError("bucket unavailable")
+
+
+@pytest.fixture
+def uploader(tmp_path, monkeypatch):
+    """Swap in an uploader writing to a temp dir, recording results like the app's one (see main.py)."""
+    def install(backend_class=LocalStorageBackend):
+        uploader = ImageUploader(backend_class(str(tmp_path), "http://media.test"), workers=1,
+                                 on_finished=record_image_upload)
+        monkeypatch.setattr(auth, "image_uploader", uploader)
+        monkeypatch.setattr(endpoints, "image_uploader", uploader)
+        return uploader
+    return install
+
+
+def put_image(client, meal_id, data, filename):
+    return client.put(f"/api/meals/{meal_id}", files={"image": (filename, data, "application/octet-stream")},
+                      headers=auth_headers("chef-0"))
+
+
+def test_undecodable_upload_is_rejected(uploader):
+    with pytest.raises(HTTPException) as rejected:
+        uploader().submit(b"not an image at all", "meal.jpg", "image/jpeg")
+    assert rejected.value.status_code == 422
+
+
+def test_upload_extension_follows_decoded_format(uploader):
+    image_url = uploader().submit(png_bytes(), "payload.exe", "application/x-msdownload")
+    assert image_url.endswith(".png")
+
+
+def test_thumbnail_is_exposed_once_stored(client, db, uploader):
+    make_user(db, "chef-0")
+    meal_id = make_meals(db, "chef-0", 1)[0].id
+    active = uploader()
+
+    updated = put_image(client, meal_id, png_bytes(), "meal.png")
+    assert updated.status_code == 200
+    active.shutdown(wait=True)
+
+    meal = client.get(f"/meals/{meal_id}").json()
+    assert meal["image_url"] == updated.json()["image_url"]
+    assert meal["thumbnail_url"].endswith("_thumb.webp")
+    thumb_path = meal["thumbnail_url"].split("http://media.test/", 1)[1]
+    assert active.backend.exists(thumb_path)
+
+    assert put_image(client, meal_id, b"garbage", "meal.png").status_code == 422
+
+
+def test_failed_upload_clears_image(client, db, uploader):
+    make_user(db, "chef-0")
+    meal_id = make_meals(db, "chef-0", 1, image_url="https://example.com/old.jpg")[0].id
+    active = uploader(FailingBackend)
+
+    assert put_image(client, meal_id, png_bytes(), "meal.png").status_code == 200
+    active.shutdown(wait=True)
+
+    meal = client.get(f"/meals/{meal_id}").json()
+    assert meal["image_url"] is None
+    assert meal["thumbnail_url"] is None
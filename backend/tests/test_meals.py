@@ -0,0 +1,5 @@
+def test_meal_discovery_limit_is_bounded(client):
+    params = {"user_lat": 36.74, "user_lon": -84.16}
+    assert client.get("/meals/", params={**params, "limit": 1000000}).status_code == 422
+    assert client.get("/meals/", params={**params, "limit": 0}).status_code == 422
+    assert client.get("/meals/", params={**params, "limit": 100}).status_code == 200
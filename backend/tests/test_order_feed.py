@@ -0,0 +1,21 @@
+from app import endpoints
+from tests.conftest import auth_headers
+
+
+async def one_event(chef_id, after=None):
+    yield f"data: {chef_id}\n\n"
+
+
+def test_order_stream_requires_the_chef(client, monkeypatch):
+    monkeypatch.setattr(endpoints, "chef_order_events", one_event)
+
+    assert client.get("/api/orders/chef-0/stream").status_code == 401
+    assert client.get("/api/orders/chef-0/stream", params={"token": "forged"}).status_code == 401
+    assert client.get("/api/orders/chef-0/stream", params={"token": "bench-token:chef-1"}).status_code == 403
+    assert client.get("/api/orders/chef-0/stream", headers=auth_headers("chef-1")).status_code == 403
+
+    # EventSource passes the ID token in the query string; other clients can send the header
+    for request in ({"params": {"token": "bench-token:chef-0"}}, {"headers": auth_headers("chef-0")}):
+        streamed = client.get("/api/orders/chef-0/stream", **request)
+        assert streamed.status_code == 200
+        assert streamed.text == "data: chef-0\n\n"
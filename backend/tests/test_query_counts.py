@@ -0,0 +1,49 @@
+"""Statement counts must not grow with the number of rows an endpoint returns (N+1 regressions)."""
+import pytest
+
+from app.database import engine
+from app.models import Base, Cart
+from tests.conftest import make_meals, make_user
+
+SIZES = (2, 10)
+
+NEARBY = {"user_lat": 36.7421, "user_lon": -84.1655, "limit": 100}
+
+# name -> size -> (method, url, request kwargs)
+REQUESTS = {
+    "cart read": lambda size: ("GET", "/api/cart/buyer", {}),
+    "cart write": lambda size: ("POST", "/api/cart/buyer", {"json": [{"meal_id": i, "quantity": 2} for i in range(1, size + 1)]}),
+    "cart remove": lambda size: ("DELETE", "/api/cart/buyer/1", {}),
+    "meal list": lambda size: ("GET", "/meals/", {"params": NEARBY}),
+    "meal list with ratings": lambda size: ("GET", "/meals/", {"params": {**NEARBY, "include_ratings": True}}),
+    "chef menu": lambda size: ("GET", "/meals/chef/chef-0", {}),
+    "meal detail": lambda size: ("GET", "/meals/1", {}),
+}
+
+
+def seed(db, size):
+    """`size` meals from as many sellers, all in the buyer's cart, plus `size` more on chef-0's menu."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    make_user(db, "buyer", role="buyer")
+    for i in range(size):
+        make_user(db, f"chef-{i}")
+        make_meals(db, f"chef-{i}", 1)
+    make_meals(db, "chef-0", size)
+    db.add(Cart(user_id="buyer", cart_items=[{"meal_id": i, "quantity": 1} for i in range(1, size + 1)]))
+    db.commit()
+
+
+@pytest.mark.parametrize("name", list(REQUESTS))
+def test_statement_count_is_constant(name, db, client, statements):
+    counts = []
+    for size in SIZES:
+        seed(db, size)
+        method, url, kwargs = REQUESTS[name](size)
+        statements.clear()
+        response = client.request(method, url, **kwargs)
+        assert response.status_code == 200, response.text
+        counts.append(len(statements))
+
+    assert counts[0] > 0
+    assert counts[0] == counts[1], f"{name}: {counts[0]} statements for {SIZES[0]} rows, {counts[1]} for {SIZES[1]}"
@@ -0,0 +1,52 @@
+import itertools
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+from app import database
+from app.main import app
+from app.models import Base, Meal, User
+from tests.conftest import CAMPUS, auth_headers, make_meals, make_user
+
+
+def lagging_replica(tmp_path, monkeypatch):
+    """Route replica reads to a copy of the primary that will not see later writes."""
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(bind=replica)
+    with database.engine.connect() as primary, replica.begin() as copy:
+        for model in (User, Meal):
+            copy.execute(insert(model), [dict(row._mapping) for row in primary.execute(select(model.__table__))])
+    replica_sessions = [sessionmaker(bind=replica)]
+    monkeypatch.setattr(database, "ReplicaSessions", replica_sessions)
+    monkeypatch.setattr(database, "_next_replica", itertools.cycle(replica_sessions))
+
+
+def listed_names(client, **kwargs):
+    response = client.get("/meals/", params={"user_lat": CAMPUS[0], "user_lon": CAMPUS[1]}, **kwargs)
+    return [meal["name"] for meal in response.json()]
+
+
+def test_reads_after_a_write_go_to_the_primary_on_any_worker(db, tmp_path, monkeypatch):
+    make_user(db, "chef-0")
+    meal_id = make_meals(db, "chef-0", 1)[0].id
+    lagging_replica(tmp_path, monkeypatch)
+
+    writer = TestClient(app)
+    updated = writer.put(f"/api/meals/{meal_id}", data={"name": "Renamed"}, headers=auth_headers("chef-0"))
+    assert updated.status_code == 200
+    written_at = updated.headers[database.LAST_WRITE_HEADER]
+    # Another worker has no record of the write; only what the client sends back pins its reads
+    database.recent_writes.clear()
+
+    assert listed_names(TestClient(app)) == ["Meal 0"]  # Other clients may read the lagging replica
+    assert listed_names(writer) == ["Renamed"]  # The last_write cookie
+    assert listed_names(TestClient(app), headers={database.LAST_WRITE_HEADER: written_at}) == ["Renamed"]
+    assert listed_names(TestClient(app), headers={"X-Consistency": "strong"}) == ["Renamed"]
+    assert listed_names(TestClient(app), headers={database.LAST_WRITE_HEADER: "0"}) == ["Meal 0"]
+
+
+def test_failed_writes_do_not_pin_reads(client):
+    rejected = client.put("/api/meals/1", data={"name": "x"})
+    assert rejected.status_code >= 400
+    assert database.LAST_WRITE_HEADER not in rejected.headers
+    assert database.LAST_WRITE_COOKIE not in client.cookies
@@ -0,0 +1,41 @@
+from app.models import Order, Review
+from app.pagination import NEXT_CURSOR_HEADER
+from tests.conftest import make_meals, make_user
+
+
+def seed_reviews(db, count):
+    make_user(db, "chef")
+    make_user(db, "buyer", role="buyer")
+    make_meals(db, "chef", 1)
+    db.add_all([Order(id=f"order-{i}", buyer_id="buyer", total_price=8.0, status="completed") for i in range(count)])
+    # Server-default timestamps: every review lands in the same second
+    db.add_all([Review(reviewer_id="buyer", chef_id="chef", meal_id=1, order_id=f"order-{i}", rating=4) for i in range(count)])
+    db.commit()
+
+
+def walk(client, url, limit):
+    pages, cursor = [], None
+    while True:
+        response = client.get(url, params={"limit": limit, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append([review["id"] for review in response.json()])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor or len(pages) > 10:
+            return pages
+
+
+def test_review_pages_advance(client, db):
+    seed_reviews(db, 5)
+
+    for url in ("/meal/1", "/chef/chef"):
+        pages = walk(client, url, limit=2)
+        assert pages[0] != pages[1]
+        assert [review_id for page in pages for review_id in page] == [5, 4, 3, 2, 1]
+
+
+def test_review_limit_is_bounded(client, db):
+    seed_reviews(db, 1)
+
+    assert client.get("/meal/1", params={"limit": 1000000}).status_code == 422
+    assert client.get("/chef/chef", params={"limit": 0}).status_code == 422
+
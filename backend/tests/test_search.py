@@ -0,0 +1,64 @@
+import threading
+import time
+
+from sqlalchemy import insert
+from app import search
+from app.models import Meal
+from app.search import MealSearchIndex
+from tests.conftest import CAMPUS, make_meals, make_user
+
+
+def test_search_index_follows_committed_writes_only(db, monkeypatch):
+    make_user(db, "chef-0")
+    meal = make_meals(db, "chef-0", 1)[0]
+    meal_search_index = MealSearchIndex(refresh_seconds=300)
+    monkeypatch.setattr(search, "meal_search_index", meal_search_index)
+    meal_search_index.rebuild(db)
+
+    meal.name = "Smoky Burrito Bowl"
+    db.flush()
+    db.rollback()
+    assert meal.id not in meal_search_index.search("burrito")
+
+    meal.name = "Smoky Burrito Bowl"
+    db.commit()
+    assert meal.id in meal_search_index.search("burrito")
+
+    db.delete(meal)
+    db.flush()
+    db.rollback()
+    assert meal.id in meal_search_index.search("burrito")
+
+    db.delete(meal)
+    db.commit()
+    assert meal.id not in meal_search_index.search("burrito")
+
+
+def test_stale_index_is_rebuilt_without_blocking_searches(db, monkeypatch):
+    make_user(db, "chef-0")
+    make_meals(db, "chef-0", 1)[0].name = "Smoky Burrito Bowl"
+    db.commit()
+    meal_search_index = MealSearchIndex(refresh_seconds=0)
+    meal_search_index.ensure_fresh(db)  # The first build blocks
+
+    # Inserted without the ORM, so only a rebuild finds it
+    db.execute(insert(Meal), [{"name": "Burrito Supreme", "description": "", "ingredients": "rice", "price": 8.0,
+                               "quantity": 1, "seller_id": "chef-0", "latitude": CAMPUS[0], "longitude": CAMPUS[1],
+                               "timeslots": [], "unlimited": False}])
+    db.commit()
+
+    release = threading.Event()
+    rebuild = meal_search_index.rebuild
+    monkeypatch.setattr(meal_search_index, "rebuild", lambda session: release.wait(5) and rebuild(session))
+
+    started = time.perf_counter()
+    meal_search_index.ensure_fresh(db)
+    meal_search_index.ensure_fresh(db)  # One rebuild at a time
+    assert time.perf_counter() - started < 1
+    assert len(meal_search_index.search("burrito")) == 1  # Still the previous index
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while len(meal_search_index.search("burrito")) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(meal_search_index.search("burrito")) == 2
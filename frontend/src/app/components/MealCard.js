@@ -79,7 +79,7 @@ import { getChefReviewSummary } from "../services/api";
           >
             <Box className="h-[60%] w-full relative">
               <Image
-                src={meal.image_url}
+                src={meal.thumbnail_url || meal.image_url}
                 alt={meal.name}
                 fill
                 style={{ objectFit: "cover" }}
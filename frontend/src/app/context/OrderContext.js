@@ -2,6 +2,8 @@
 import React, { createContext, useContext, useState, useEffect } from "react";
 import { useCart } from "./CartContext";
 import { useAuth } from "./AuthContext";
+import { auth } from "../../../utils/firebase";
+import { getIdToken } from "firebase/auth";
 
 const OrderContext = createContext();
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
@@ -83,6 +85,48 @@ export const OrderProvider = ({ children }) => {
     }
   }, [user?.id]); // Fetch orders when user changes
 
+  // Live updates: new and changed orders are pushed over Server-Sent Events instead of polling.
+  // EventSource reconnects by itself and resumes from the last event it received. It cannot send
+  // headers, so the Firebase ID token goes in the query string; once the server rejects it (tokens
+  // expire after an hour) the stream is reopened with a fresh token, resuming via `cursor`.
+  useEffect(() => {
+    if (!user?.id || typeof EventSource === "undefined") return;
+
+    let source = null;
+    let lastEventId = null;
+    let stopped = false;
+
+    const connect = async () => {
+      if (stopped || !auth.currentUser) return;
+      const params = new URLSearchParams({ token: await getIdToken(auth.currentUser) });
+      if (lastEventId) params.set("cursor", lastEventId);
+      if (stopped) return;
+
+      source = new EventSource(`${API_URL}/api/orders/${user.id}/stream?${params}`);
+      source.addEventListener("chef_order", (event) => {
+        lastEventId = event.lastEventId;
+        const changed = JSON.parse(event.data);
+        setOrders((prevOrders) => {
+          const current = Array.isArray(prevOrders) ? prevOrders : [];
+          const index = current.findIndex((o) => o.id === changed.id);
+          if (index === -1) return [...current, changed];
+          const next = [...current];
+          next[index] = { ...next[index], ...changed };
+          return next;
+        });
+      });
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED) setTimeout(connect, 3000);
+      };
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      if (source) source.close();
+    };
+  }, [user?.id]);
+
   const updateOrder = (newDetails) => {
     setOrder((prevOrder) => ({ ...prevOrder, ...newDetails }));
   };